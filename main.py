@@ -3,6 +3,9 @@ import sys
 import pygame
 
 from src.board import Board
+from src.game_state import GameState
+from src.journal import open_game
+from src.profiler import Profiler
 from utils.constants import *
 
 
@@ -13,14 +16,29 @@ def keyboard_input():
 
 
 class Screen:
-    def __init__(self):
+    # fen sets up the board in the given position instead of the starting position, profile_path turns on the
+    # profiler, which writes its trace there on exit (an empty string keeps it in memory for the overlay only),
+    # with journal_path every move is saved there and a game saved there before is resumed
+    def __init__(self, event_driven: bool = EVENT_DRIVEN_RENDERING, fen: str | None = None,
+                 profile_path: str | None = None, journal_path: str | None = None):
         pygame.init()
 
         pygame.display.set_caption('Chess')
         self.screen: pygame.surface = pygame.display.set_mode(SCREEN_DIMENSIONS)
-        self.board: Board = Board(self.screen)
+        if journal_path is not None:
+            game = open_game(journal_path, fen)
+        else:
+            game = GameState.from_fen(fen) if fen else None
+        self.board: Board = Board(self.screen, game)
         self.clock: pygame.time.Clock = pygame.time.Clock()
         self.can_left_click: bool = True
+        self.event_driven: bool = event_driven
+
+        self.profile_path: str | None = profile_path
+        self.profiler: Profiler | None = None
+        if profile_path is not None:
+            self.profiler = Profiler()
+            self.profiler.attach(self)
 
     def mouse_input(self):
         if self.can_left_click:
@@ -41,13 +59,51 @@ class Screen:
             if right_click:
                 pass
 
+    # pushes the drawn frame to the display, only the given areas if there are any
+    def flip(self, dirty_rects: list | None = None):
+        if self.profiler is not None and self.profiler.overlay:
+            overlay = self.profiler.draw_overlay(self.screen, self.board.tile_change)
+            if dirty_rects is not None:
+                dirty_rects.append(overlay)
+
+        if dirty_rects is None:
+            pygame.display.flip()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+
+    def handle_key(self, key: int):
+        if key == pygame.K_BACKSPACE:  # take back last move
+            self.board.take_back()
+        if key == pygame.K_F3 and self.profiler is not None:  # show or hide the profiler overlay
+            self.profiler.overlay = not self.profiler.overlay
+            self.screen.fill(DARK_TILE_COLOR)
+            self.board.invalidate()
+
+    def quit(self):
+        self.board.close()
+        if self.profiler is not None and self.profile_path:
+            self.profiler.dump(self.profile_path)
+        pygame.quit()
+        sys.exit()
+
     def run(self):
+        if self.event_driven:
+            self.run_event_driven()
+        else:
+            self.run_continuous()
+
+    # redraws the whole screen every frame
+    def run_continuous(self):
         while True:
             self.screen.fill(DARK_TILE_COLOR)
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:  # exit on clicking X on window
-                    pygame.quit()
-                    sys.exit()
+                    self.quit()
+
+                if event.type == pygame.KEYDOWN:
+                    self.handle_key(event.key)
+
+            self.board.update_engine()
 
             # renders
             self.board.render()
@@ -56,8 +112,63 @@ class Screen:
             keyboard_input()
             self.mouse_input()
 
-            pygame.display.flip()  # update screen
+            self.flip()  # update screen
+            if self.profiler is not None:
+                self.profiler.end_frame()
             self.clock.tick(FRAME_RATE)
 
+    # sleeps until something happens and only pushes the tiles that changed to the display
+    def run_event_driven(self):
+        self.board.update_engine()
+        self.flip(self.board.render_dirty())
+        while True:
+            # block while idle, only wake up regularly to collect the engine's output while it thinks, the
+            # profiler overlay is refreshed as often
+            idle = not self.board.engine_thinking and (self.profiler is None or not self.profiler.overlay)
+            timeout = 0 if idle else ENGINE_POLL_INTERVAL
+            events = [pygame.event.wait(timeout)] + pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:  # exit on clicking X on window
+                    self.quit()
+
+                if event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.VIDEOEXPOSE):
+                    self.board.invalidate()
+
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    self.board.left_press_at(event.pos)
+
+                if event.type == pygame.KEYDOWN:
+                    self.handle_key(event.key)
+
+            # inputs
+            keyboard_input()
+
+            self.board.update_engine()
+
+            self.flip(self.board.render_dirty())
+            if self.profiler is not None:
+                self.profiler.end_frame()
+
+
+USAGE = 'usage: python main.py [--profile [TRACE.csv|TRACE.json]] [--journal FILE] [FEN]'
+
+
+def main(arguments: list[str]) -> int:
+    profile_path = journal_path = None
+    while arguments and arguments[0] in ('--profile', '--journal'):
+        option, arguments = arguments[0], arguments[1:]
+        if option == '--journal':
+            if not arguments or arguments[0].startswith('--'):
+                print(f'{USAGE}\nmain.py: error: --journal needs a FILE', file=sys.stderr)
+                return 2
+            journal_path, arguments = arguments[0], arguments[1:]
+        else:
+            profile_path = ''
+            if arguments and arguments[0].endswith(('.csv', '.json')):
+                profile_path, arguments = arguments[0], arguments[1:]
+    Screen(fen=' '.join(arguments) or None, profile_path=profile_path, journal_path=journal_path).run()
+    return 0
+
 
-Screen().run()
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,160 @@
+# analyses a file of positions in a pool of processes and writes one JSON line per position, in input order:
+# the legal moves, the evaluation of evaluation.py (material, piece-square tables and mobility in centipawns
+# for the side to move, scored for a whole chunk at once) and, with --depth, the best move of a search
+#
+# the input is read lazily in chunks and only a few chunks per worker are in flight at once, so files far
+# larger than memory stream through, lines may be FEN or EPD (the EPD operations are ignored), empty lines
+# and lines starting with # are skipped
+#
+# run with: python -m src.analysis positions.fen [--output results.jsonl] [--depth 3] [--workers 4]
+#           [--chunk-size 256]
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from src.bitboard import *
+from src.evaluation import evaluate_batch
+from src.fen import parse_fen
+from src.search import Search
+from src.transposition import TranspositionTable
+
+CHUNK_SIZE = 256  # positions sent to a worker at once
+CHUNKS_PER_WORKER = 4  # chunks queued per worker before reading more of the input
+HASH_MB = 16  # transposition table of every worker when searching
+
+# search of the worker process, made by start_worker
+worker_search: Search | None = None
+
+
+def start_worker(hash_mb: int):
+    global worker_search
+    worker_search = Search(TranspositionTable(hash_mb))
+
+
+# the FEN of a FEN or EPD line, EPD lines have no counters but operations such as 'bm e4;' after the fields
+def line_fen(line: str) -> str:
+    fields = line.split()
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return ' '.join(fields[:6])
+    return ' '.join(fields[:4])
+
+
+# the position of a line, or the error that it is not a valid FEN
+def read_position(fen: str) -> BitBoard | str:
+    try:
+        return parse_fen(fen)
+    except (IndexError, ValueError) as error:
+        return str(error) or 'invalid FEN'
+
+
+def analyse(number: int, fen: str, position: BitBoard, evaluation: int, depth: int) -> dict:
+    moves = position.legal_moves()
+    result = {'line': number, 'fen': fen, 'legal_moves': [move_name(move) for move in moves],
+              'evaluation': evaluation}
+    if not moves:
+        result['status'] = 'checkmate' if position.in_check() else 'stalemate'
+    elif depth:
+        searched = worker_search.search(position, max_depth=depth)
+        result.update(best_move=move_name(searched['best_move']), score=searched['score'],
+                      pv=[move_name(move) for move in searched['pv']], nodes=searched['nodes'])
+    return result
+
+
+# analyses a chunk of (line number, line) pairs in a worker, returns their JSON lines
+def analyse_chunk(task: tuple) -> str:
+    chunk, depth = task
+    fens = [line_fen(line) for _, line in chunk]
+    positions = [read_position(fen) for fen in fens]
+    evaluations = iter(evaluate_batch(position for position in positions if isinstance(position, BitBoard)))
+    lines = list()
+    for (number, _), fen, position in zip(chunk, fens, positions):
+        if isinstance(position, BitBoard):
+            result = analyse(number, fen, position, int(next(evaluations)), depth)
+        else:
+            result = {'line': number, 'fen': fen, 'error': position}
+        lines.append(json.dumps(result) + '\n')
+    return ''.join(lines)
+
+
+# (line number, line) of every position in a file, line numbers start at 1
+def read_positions(file):
+    for number, line in enumerate(file, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def chunks_of(items, size: int):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+# analyses every position of the input file, writing the results to output in input order and calling
+# on_progress with the positions written and the seconds taken after every chunk, returns (positions, seconds)
+def run(path: str, output, depth: int = 0, workers: int = multiprocessing.cpu_count(),
+        chunk_size: int = CHUNK_SIZE, hash_mb: int = HASH_MB, on_progress=None) -> tuple:
+    start = time.perf_counter()
+    positions = 0
+    pool = multiprocessing.Pool(workers, initializer=start_worker, initargs=(hash_mb,))
+    try:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            pending: deque = deque()
+            for chunk in chunks_of(read_positions(file), chunk_size):
+                pending.append((len(chunk), pool.apply_async(analyse_chunk, ((chunk, depth),))))
+
+                # results are written in order as soon as the oldest chunk is done, input is only read while
+                # fewer than CHUNKS_PER_WORKER chunks per worker are waiting
+                while pending and (len(pending) >= workers * CHUNKS_PER_WORKER or pending[0][1].ready()):
+                    count, result = pending.popleft()
+                    output.write(result.get())
+                    positions += count
+                    if on_progress is not None:
+                        on_progress(positions, time.perf_counter() - start)
+
+            while pending:
+                count, result = pending.popleft()
+                output.write(result.get())
+                positions += count
+                if on_progress is not None:
+                    on_progress(positions, time.perf_counter() - start)
+    finally:
+        pool.terminate()
+        pool.join()
+    return positions, time.perf_counter() - start
+
+
+def show_progress(positions: int, elapsed: float):
+    print(f'\r{positions} positions, {positions / elapsed:.0f} positions/s', end='', file=sys.stderr, flush=True)
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Analyse a file of FEN or EPD positions into JSON lines.')
+    parser.add_argument('path', help='one FEN or EPD position per line')
+    parser.add_argument('--output', help='JSONL file to write, standard output if left out')
+    parser.add_argument('--depth', type=int, default=0, help='also search every position this deep for a best move')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--hash', type=int, default=HASH_MB, help='transposition table size of every worker in MB')
+    arguments = parser.parse_args(arguments)
+
+    output = open(arguments.output, 'w', encoding='utf-8') if arguments.output else sys.stdout
+    try:
+        on_progress = show_progress if arguments.output else None  # standard output may be the results
+        positions, elapsed = run(arguments.path, output, arguments.depth, max(arguments.workers, 1),
+                                 max(arguments.chunk_size, 1), arguments.hash, on_progress)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+            print(file=sys.stderr)
+    print(f'{positions} positions in {elapsed:.2f}s, {positions / elapsed if elapsed else 0:.0f} positions/s',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,597 @@
+# position stored as twelve 64-bit piece bitboards plus occupancy masks
+#
+# squares are numbered from a1 = 0 to h8 = 63, board tile (x, y) with white at the bottom maps to
+# square (8 - y) * 8 + x - 1, so bit n of a bitboard is set if a piece stands on square n
+from src.zobrist import ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_PIECES, compute_key, en_passant_key
+
+WHITE = 0
+BLACK = 1
+COLOR_NAMES = ('white', 'black')
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+PIECE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+
+EMPTY = -1  # mailbox value of a square without a piece
+
+# castling rights
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+NOT_FILE_AB = NOT_FILE_A & (FULL ^ (FILE_A << 1))
+NOT_FILE_GH = NOT_FILE_H & (FULL ^ (FILE_H >> 1))
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+# (shift, mask that removes squares wrapped around the board edge)
+NORTH = (8, FULL)
+SOUTH = (-8, FULL)
+EAST = (1, NOT_FILE_A)
+WEST = (-1, NOT_FILE_H)
+NORTH_EAST = (9, NOT_FILE_A)
+NORTH_WEST = (7, NOT_FILE_H)
+SOUTH_EAST = (-7, NOT_FILE_A)
+SOUTH_WEST = (-9, NOT_FILE_H)
+ORTHOGONAL_DIRECTIONS = (NORTH, SOUTH, EAST, WEST)
+DIAGONAL_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+
+# castling rights that are lost when a piece moves from or to a square
+CASTLING_LOST = [0] * 64
+CASTLING_LOST[0] = WHITE_QUEENSIDE
+CASTLING_LOST[4] = WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_LOST[7] = WHITE_KINGSIDE
+CASTLING_LOST[56] = BLACK_QUEENSIDE
+CASTLING_LOST[60] = BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_LOST[63] = BLACK_KINGSIDE
+
+# squares the king passes over (which must not be attacked) when castling to a square
+CASTLING_PATH = {6: 0x60, 2: 0x0C, 62: 0x60 << 56, 58: 0x0C << 56}
+
+# (castling right, color, king square, rook square) the king and rook start on for every castling right
+CASTLING_SQUARES = ((WHITE_KINGSIDE, WHITE, 4, 7), (WHITE_QUEENSIDE, WHITE, 4, 0),
+                    (BLACK_KINGSIDE, BLACK, 60, 63), (BLACK_QUEENSIDE, BLACK, 60, 56))
+
+LIGHT_SQUARES = 0x55AA55AA55AA55AA
+
+
+def square_of(x, y) -> int:
+    return (8 - int(y)) * 8 + int(x) - 1
+
+
+def location_of(square: int) -> tuple:
+    return square % 8 + 1, 8 - square // 8
+
+
+def piece_index(color: int, piece_type: int) -> int:
+    return color * 6 + piece_type
+
+
+# moves are packed into an int: from square, to square and the promotion piece type (0 if none)
+def encode_move(from_square: int, to_square: int, promotion: int = 0) -> int:
+    return from_square | to_square << 6 | promotion << 12
+
+
+def move_from(move: int) -> int:
+    return move & 63
+
+
+def move_to(move: int) -> int:
+    return move >> 6 & 63
+
+
+def move_promotion(move: int) -> int:
+    return move >> 12
+
+
+# coordinate notation of a move, e.g. e2e4 or e7e8q
+def move_name(move: int) -> str:
+    name = ''
+    for square in (move_from(move), move_to(move)):
+        name += 'abcdefgh'[square % 8] + str(square // 8 + 1)
+    if move_promotion(move):
+        name += 'pnbrqk'[move_promotion(move)]
+    return name
+
+
+def shift(bitboard: int, direction: tuple) -> int:
+    amount, mask = direction
+    if amount > 0:
+        return (bitboard << amount) & mask & FULL
+    return (bitboard >> -amount) & mask
+
+
+def squares_of(bitboard: int):
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+def knight_attacks(bitboard: int) -> int:
+    return (((bitboard << 17) & NOT_FILE_A) | ((bitboard << 15) & NOT_FILE_H) |
+            ((bitboard << 10) & NOT_FILE_AB) | ((bitboard << 6) & NOT_FILE_GH) |
+            ((bitboard >> 17) & NOT_FILE_H) | ((bitboard >> 15) & NOT_FILE_A) |
+            ((bitboard >> 10) & NOT_FILE_GH) | ((bitboard >> 6) & NOT_FILE_AB)) & FULL
+
+
+def king_attacks(bitboard: int) -> int:
+    sides = ((bitboard << 1) & NOT_FILE_A) | ((bitboard >> 1) & NOT_FILE_H)
+    row = bitboard | sides
+    return (sides | (row << 8) | (row >> 8)) & FULL
+
+
+def pawn_attacks(bitboard: int, color: int) -> int:
+    if color == WHITE:
+        return shift(bitboard, NORTH_EAST) | shift(bitboard, NORTH_WEST)
+    return shift(bitboard, SOUTH_EAST) | shift(bitboard, SOUTH_WEST)
+
+
+# squares a sliding piece reaches along the given directions, stopping at (and including) the first piece
+def slider_attacks(bitboard: int, directions: tuple, occupied: int) -> int:
+    attacks = 0
+    for direction in directions:
+        ray = bitboard
+        while True:
+            ray = shift(ray, direction)
+            if not ray:
+                break
+            attacks |= ray
+            if ray & occupied:
+                break
+    return attacks
+
+
+# squares strictly between two squares on the same line, 0 if they don't share a line
+BETWEEN: list[list[int]] = [[0] * 64 for _ in range(64)]
+for _square in range(64):
+    for _direction in ORTHOGONAL_DIRECTIONS + DIAGONAL_DIRECTIONS:
+        _ray, _bit = 0, 1 << _square
+        while True:
+            _bit = shift(_bit, _direction)
+            if not _bit:
+                break
+            BETWEEN[_square][_bit.bit_length() - 1] = _ray
+            _ray |= _bit
+
+# squares every piece attacks from each square, built once so that move generation only looks them up and
+# checks the occupancy
+KNIGHT_ATTACKS: list[int] = [knight_attacks(1 << _square) for _square in range(64)]
+KING_ATTACKS: list[int] = [king_attacks(1 << _square) for _square in range(64)]
+PAWN_ATTACKS: tuple = tuple([pawn_attacks(1 << _square, _color) for _square in range(64)] for _color in (WHITE, BLACK))
+
+
+# squares from every square to the board edge in one direction, not including the square itself
+def ray_table(direction: tuple) -> list[int]:
+    return [slider_attacks(1 << square, (direction,), 0) for square in range(64)]
+
+
+# rays towards higher squares, whose first piece is the lowest set bit, and towards lower squares, whose first
+# piece is the highest set bit
+ORTHOGONAL_RAYS = ((ray_table(NORTH), ray_table(EAST)), (ray_table(SOUTH), ray_table(WEST)))
+DIAGONAL_RAYS = ((ray_table(NORTH_EAST), ray_table(NORTH_WEST)), (ray_table(SOUTH_EAST), ray_table(SOUTH_WEST)))
+
+
+# squares a sliding piece on a square reaches along the given rays, stopping at (and including) the first piece,
+# every blocked ray is cut by removing the ray behind its first piece
+def ray_attacks(square: int, rays: tuple, occupied: int) -> int:
+    (up, right), (down, left) = rays
+    attacks = 0
+    for table in (up, right):
+        ray = table[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= table[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for table in (down, left):
+        ray = table[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= table[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return ray_attacks(square, ORTHOGONAL_RAYS, occupied)
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return ray_attacks(square, DIAGONAL_RAYS, occupied)
+
+
+class BitBoard:
+    # no per-instance dict, positions are kept by the million in searches, books and game archives
+    __slots__ = ('pieces', 'occupancy', 'mailbox', 'side', 'castling', 'en_passant', 'halfmove_clock', 'key',
+                 'history', 'repetitions')
+
+    def __init__(self):
+        # one bitboard per color and piece type, indexed by piece_index(color, piece_type)
+        self.pieces: list[int] = [0] * 12
+
+        # occupancy of white pieces, black pieces and both
+        self.occupancy: list[int] = [0, 0, 0]
+
+        # piece index on every square, so the piece on a square is found without scanning bitboards
+        self.mailbox: list[int] = [EMPTY] * 64
+
+        self.side: int = WHITE
+        self.castling: int = 0
+        self.en_passant: int = EMPTY  # square a pawn can capture to en passant
+        self.halfmove_clock: int = 0  # moves since the last pawn move or capture
+
+        # zobrist key of the position, updated with every change
+        self.key: int = 0
+
+        # undo records of the moves made so far:
+        # (move, moved piece, captured piece, en passant, castling, halfmove clock, key)
+        self.history: list[tuple] = list()
+
+        # how often every key of self.history occurs in it, kept up to date by make_move and unmake_move, a
+        # position before a pawn move or capture can never come back, so this only ever finds repetitions since
+        # the last one
+        self.repetitions: dict[int:int] = dict()
+
+    @classmethod
+    def starting_position(cls):
+        bitboard = cls()
+        back_rank = (ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK)
+        for file, piece_type in enumerate(back_rank):
+            bitboard.add_piece(file, WHITE, piece_type)
+            bitboard.add_piece(8 + file, WHITE, PAWN)
+            bitboard.add_piece(48 + file, BLACK, PAWN)
+            bitboard.add_piece(56 + file, BLACK, piece_type)
+        bitboard.castling = WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
+        bitboard.key = compute_key(bitboard)
+        return bitboard
+
+    # builds bitboards from an iterable of Pieces, by default castling is allowed wherever a king and a rook
+    # still stand on their starting squares
+    @classmethod
+    def from_pieces(cls, chess_pieces, side: int = WHITE, castling: int | None = None, en_passant: int = EMPTY):
+        bitboard = cls()
+        for piece in chess_pieces:
+            bitboard.add_piece(piece.square, piece.color, piece.type)
+        bitboard.side = side
+
+        if castling is None:
+            castling = 0
+            for right, color, king_square, rook_square in CASTLING_SQUARES:
+                if bitboard.mailbox[king_square] == piece_index(color, KING) and \
+                        bitboard.mailbox[rook_square] == piece_index(color, ROOK):
+                    castling |= right
+        bitboard.castling = castling
+        bitboard.en_passant = en_passant
+        bitboard.key = compute_key(bitboard)
+        return bitboard
+
+    def copy(self):
+        bitboard = BitBoard()
+        bitboard.pieces = self.pieces.copy()
+        bitboard.occupancy = self.occupancy.copy()
+        bitboard.mailbox = self.mailbox.copy()
+        bitboard.side = self.side
+        bitboard.castling = self.castling
+        bitboard.en_passant = self.en_passant
+        bitboard.halfmove_clock = self.halfmove_clock
+        bitboard.key = self.key
+        bitboard.history = self.history.copy()
+        bitboard.repetitions = self.repetitions.copy()
+        return bitboard
+
+    # drops the undo records from before the last pawn move or capture, they can't be repeated any more, e.g.
+    # before sending the position to a search process
+    def trim_history(self):
+        self.history = self.history[len(self.history) - self.halfmove_clock:] if self.halfmove_clock else list()
+        self.repetitions = dict()
+        for record in self.history:
+            self.repetitions[record[6]] = self.repetitions.get(record[6], 0) + 1
+
+    # how many times the current position has occurred, itself included
+    def repetition_count(self) -> int:
+        return self.repetitions.get(self.key, 0) + 1
+
+    # 'threefold_repetition' or 'fifty_moves' if a draw can be claimed in this position, None otherwise
+    def draw_claim(self) -> str | None:
+        if self.repetitions.get(self.key, 0) >= 2:
+            return 'threefold_repetition'
+        if self.halfmove_clock >= 100:
+            return 'fifty_moves'
+        return None
+
+    def add_piece(self, square: int, color: int, piece_type: int):
+        bit = 1 << square
+        self.pieces[piece_index(color, piece_type)] |= bit
+        self.occupancy[color] |= bit
+        self.occupancy[2] |= bit
+        self.mailbox[square] = piece_index(color, piece_type)
+        self.key ^= ZOBRIST_PIECES[piece_index(color, piece_type)][square]
+
+    def remove_piece(self, square: int):
+        index = self.mailbox[square]
+        bit = 1 << square
+        self.pieces[index] ^= bit
+        self.occupancy[index // 6] ^= bit
+        self.occupancy[2] ^= bit
+        self.mailbox[square] = EMPTY
+        self.key ^= ZOBRIST_PIECES[index][square]
+
+    # returns (color, piece type) of the piece on a square, or None if it is empty
+    def piece_at(self, square: int) -> tuple | None:
+        index = self.mailbox[square]
+        if index == EMPTY:
+            return None
+        return index // 6, index % 6
+
+    # bitboard of the squares the piece on a square can move to, not taking checks into account
+    def targets(self, square: int) -> int:
+        index = self.mailbox[square]
+        if index == EMPTY:
+            return 0
+
+        color, piece_type = index // 6, index % 6
+        bit = 1 << square
+        own = self.occupancy[color]
+        occupied = self.occupancy[2]
+
+        match piece_type:
+            case 0:  # pawn
+                forward = NORTH if color == WHITE else SOUTH
+                start_rank = RANK_2 if color == WHITE else RANK_7
+                one = shift(bit, forward) & ~occupied
+                two = shift(one, forward) & ~occupied if bit & start_rank else 0
+
+                enemies = self.occupancy[1 - color]
+                if self.en_passant != EMPTY and color == self.side:
+                    enemies |= 1 << self.en_passant
+                return one | two | (PAWN_ATTACKS[color][square] & enemies)
+
+            case 1:  # knight
+                return KNIGHT_ATTACKS[square] & ~own
+
+            case 2:  # bishop
+                return bishop_attacks(square, occupied) & ~own
+
+            case 3:  # rook
+                return rook_attacks(square, occupied) & ~own
+
+            case 4:  # queen
+                return (rook_attacks(square, occupied) | bishop_attacks(square, occupied)) & ~own
+
+            case _:  # king
+                return (KING_ATTACKS[square] & ~own) | self.castling_targets(color)
+
+    def castling_targets(self, color: int) -> int:
+        occupied = self.occupancy[2]
+        rooks = self.pieces[color * 6 + ROOK]  # the rights should already imply the rook, but never trust them
+        result = 0
+        if color == WHITE:
+            if self.castling & WHITE_KINGSIDE and rooks & 0x80 and not occupied & 0x60:
+                result |= 1 << 6
+            if self.castling & WHITE_QUEENSIDE and rooks & 0x01 and not occupied & 0x0E:
+                result |= 1 << 2
+        else:
+            if self.castling & BLACK_KINGSIDE and rooks & (0x80 << 56) and not occupied & (0x60 << 56):
+                result |= 1 << 62
+            if self.castling & BLACK_QUEENSIDE and rooks & (0x01 << 56) and not occupied & (0x0E << 56):
+                result |= 1 << 58
+        return result
+
+    def possible_places(self, square: int) -> list[int]:
+        return list(squares_of(self.targets(square)))
+
+    # all moves of the side to move, not taking checks into account
+    def pseudo_legal_moves(self) -> list[int]:
+        moves: list[int] = list()
+        for from_square in squares_of(self.occupancy[self.side]):
+            promotes = self.mailbox[from_square] % 6 == PAWN
+            for to_square in squares_of(self.targets(from_square)):
+                if promotes and (to_square < 8 or to_square >= 56):
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append(encode_move(from_square, to_square, promotion))
+                else:
+                    moves.append(encode_move(from_square, to_square))
+        return moves
+
+    # bitboard of the pieces of a color that attack a square, with occupied as the blocking pieces
+    def attackers_to(self, square: int, color: int, occupied: int) -> int:
+        offset = color * 6
+        pieces = self.pieces
+        rooks = pieces[offset + ROOK] | pieces[offset + QUEEN]
+        bishops = pieces[offset + BISHOP] | pieces[offset + QUEEN]
+        return ((KNIGHT_ATTACKS[square] & pieces[offset + KNIGHT]) |
+                (KING_ATTACKS[square] & pieces[offset + KING]) |
+                (PAWN_ATTACKS[1 - color][square] & pieces[offset + PAWN]) |
+                (ray_attacks(square, ORTHOGONAL_RAYS, occupied) & rooks if rooks else 0) |
+                (ray_attacks(square, DIAGONAL_RAYS, occupied) & bishops if bishops else 0))
+
+    def is_attacked(self, square: int, color: int) -> bool:
+        return self.attackers_to(square, color, self.occupancy[2]) != 0
+
+    def in_check(self) -> bool:
+        king = self.pieces[piece_index(self.side, KING)]
+        return king != 0 and self.is_attacked(king.bit_length() - 1, 1 - self.side)
+
+    # squares every pinned piece of the side to move may still move to: along the line between its king
+    # and the pinning piece, including capturing the pinning piece
+    def pin_masks(self, king_square: int) -> dict[int:int]:
+        side, enemy = self.side, 1 - self.side
+        enemy_pieces = self.occupancy[enemy]
+        own_pieces = self.occupancy[side]
+
+        # enemy sliders that would attack the king if own pieces were out of the way
+        pinners = ((rook_attacks(king_square, enemy_pieces) &
+                    (self.pieces[enemy * 6 + ROOK] | self.pieces[enemy * 6 + QUEEN])) |
+                   (bishop_attacks(king_square, enemy_pieces) &
+                    (self.pieces[enemy * 6 + BISHOP] | self.pieces[enemy * 6 + QUEEN])))
+
+        masks: dict[int:int] = dict()
+        for pinner in squares_of(pinners):
+            between = BETWEEN[king_square][pinner]
+            blockers = between & own_pieces
+            if blockers and not blockers & (blockers - 1):  # exactly one own piece in the way
+                masks[blockers.bit_length() - 1] = between | 1 << pinner
+        return masks
+
+    # all moves of the side to move that don't leave its own king in check
+    def legal_moves(self) -> list[int]:
+        side, enemy = self.side, 1 - self.side
+        king = self.pieces[piece_index(side, KING)]
+        if not king:
+            return self.pseudo_legal_moves()
+
+        king_square = king.bit_length() - 1
+        own = self.occupancy[side]
+        occupied = self.occupancy[2]
+        moves: list[int] = list()
+
+        # the king may go to any square that is not attacked once it has left its current square
+        for to_square in squares_of(KING_ATTACKS[king_square] & ~own):
+            if not self.attackers_to(to_square, enemy, occupied ^ king):
+                moves.append(encode_move(king_square, to_square))
+
+        checkers = self.attackers_to(king_square, enemy, occupied)
+        if checkers & (checkers - 1):  # in double check only the king can move
+            return moves
+
+        if checkers:
+            # other pieces have to capture the checking piece or block its line
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+            for to_square in squares_of(self.castling_targets(side)):
+                path = CASTLING_PATH[to_square]
+                if not any(self.attackers_to(square, enemy, occupied) for square in squares_of(path)):
+                    moves.append(encode_move(king_square, to_square))
+
+        pins = self.pin_masks(king_square)
+        en_passant = 1 << self.en_passant if self.en_passant != EMPTY else 0
+        last_rank = RANK_8 if side == WHITE else RANK_1
+
+        for from_square in squares_of(own ^ king):
+            targets = self.targets(from_square)
+            is_pawn = self.mailbox[from_square] % 6 == PAWN
+
+            # en passant removes two pieces from a line, so it is checked by playing it
+            if is_pawn and targets & en_passant:
+                targets ^= en_passant
+                move = encode_move(from_square, self.en_passant)
+                self.make_move(move)
+                self.side = side
+                if not self.in_check():
+                    moves.append(move)
+                self.side = enemy
+                self.unmake_move()
+
+            targets &= check_mask & pins.get(from_square, FULL)
+            for to_square in squares_of(targets):
+                if is_pawn and 1 << to_square & last_rank:
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append(encode_move(from_square, to_square, promotion))
+                else:
+                    moves.append(encode_move(from_square, to_square))
+        return moves
+
+    # true if neither side has enough pieces left to ever checkmate
+    def insufficient_material(self) -> bool:
+        pieces = self.pieces
+        for piece_type in (PAWN, ROOK, QUEEN):
+            if pieces[piece_type] or pieces[6 + piece_type]:
+                return False
+
+        knights = pieces[KNIGHT] | pieces[6 + KNIGHT]
+        bishops = pieces[BISHOP] | pieces[6 + BISHOP]
+        minors = knights | bishops
+        if not minors & (minors - 1):  # at most one knight or bishop
+            return True
+
+        # only bishops, all standing on squares of the same color
+        return not knights and (not bishops & LIGHT_SQUARES or not bishops & ~LIGHT_SQUARES)
+
+    # moves a piece in place, handling captures, en passant, castling and promotion, then passes the turn,
+    # everything needed to take the move back is pushed onto self.history
+    def make_move(self, move: int):
+        from_square, to_square, promotion = move & 63, move >> 6 & 63, move >> 12
+        moved = self.mailbox[from_square]
+        captured = self.mailbox[to_square]
+        color, piece_type = moved // 6, moved % 6
+
+        # the en passant part of the key depends on the pawns, so it is found before they move
+        en_passant_part = en_passant_key(self.en_passant, self.pieces[color * 6 + PAWN])
+
+        self.history.append((move, moved, captured, self.en_passant, self.castling, self.halfmove_clock, self.key))
+        self.repetitions[self.key] = self.repetitions.get(self.key, 0) + 1
+        self.halfmove_clock = 0 if captured != EMPTY or piece_type == PAWN else self.halfmove_clock + 1
+
+        if captured != EMPTY:
+            self.remove_piece(to_square)
+        elif piece_type == PAWN and to_square == self.en_passant:
+            self.remove_piece(to_square - 8 if color == WHITE else to_square + 8)
+
+        self.remove_piece(from_square)
+        if piece_type == PAWN and (to_square < 8 or to_square >= 56):
+            piece_type = promotion if promotion else QUEEN
+        self.add_piece(to_square, color, piece_type)
+
+        # castling also moves the rook next to the king
+        if piece_type == KING and abs(to_square - from_square) == 2:
+            rook_from, rook_to = (from_square + 3, from_square + 1) if to_square > from_square \
+                else (from_square - 4, from_square - 1)
+            self.remove_piece(rook_from)
+            self.add_piece(rook_to, color, ROOK)
+
+        key = self.key ^ en_passant_part ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_BLACK_TO_MOVE
+
+        self.en_passant = EMPTY
+        if piece_type == PAWN and abs(to_square - from_square) == 16:
+            self.en_passant = (from_square + to_square) // 2
+
+        self.castling &= ~(CASTLING_LOST[from_square] | CASTLING_LOST[to_square])
+        self.side = 1 - color
+        self.key = key ^ en_passant_key(self.en_passant, self.pieces[self.side * 6 + PAWN]) ^ \
+            ZOBRIST_CASTLING[self.castling]
+
+    # takes back the last move made with make_move
+    def unmake_move(self):
+        move, moved, captured, en_passant, castling, halfmove_clock, key = self.history.pop()
+        count = self.repetitions[key] - 1
+        if count:
+            self.repetitions[key] = count
+        else:
+            del self.repetitions[key]
+        from_square, to_square = move & 63, move >> 6 & 63
+        color, piece_type = moved // 6, moved % 6
+
+        self.remove_piece(to_square)
+        self.add_piece(from_square, color, piece_type)
+
+        if captured != EMPTY:
+            self.add_piece(to_square, captured // 6, captured % 6)
+        elif piece_type == PAWN and to_square == en_passant:
+            self.add_piece(to_square - 8 if color == WHITE else to_square + 8, 1 - color, PAWN)
+
+        if piece_type == KING and abs(to_square - from_square) == 2:
+            rook_from, rook_to = (from_square + 3, from_square + 1) if to_square > from_square \
+                else (from_square - 4, from_square - 1)
+            self.remove_piece(rook_to)
+            self.add_piece(rook_from, color, ROOK)
+
+        self.en_passant = en_passant
+        self.castling = castling
+        self.halfmove_clock = halfmove_clock
+        self.side = color
+        self.key = key
@@ -0,0 +1,181 @@
+# scores many positions at once with numpy: material (MATERIAL of search.py), piece-square tables and mobility
+#
+# positions are encoded as an (N, 64) int8 array holding the mailbox of every position shifted by one,
+# so 0 is an empty square and 1 to 12 are the piece indices of bitboard.piece_index plus one
+import numpy as np
+
+from src.bitboard import BLACK, DIAGONAL_RAYS, KING_ATTACKS, KNIGHT_ATTACKS, ORTHOGONAL_RAYS, WHITE, squares_of
+from src.search import MATERIAL
+
+# piece-square tables in centipawns for white, indexed by square (a1 = 0), black uses them mirrored
+PIECE_SQUARE_TABLES = np.array([
+    # pawn
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     5, 10, 10, -20, -20, 10, 10, 5,
+     5, -5, -10, 0, 0, -10, -5, 5,
+     0, 0, 0, 20, 20, 0, 0, 0,
+     5, 5, 10, 25, 25, 10, 5, 5,
+     10, 10, 20, 30, 30, 20, 10, 10,
+     50, 50, 50, 50, 50, 50, 50, 50,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    # knight
+    [-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20, 0, 5, 5, 0, -20, -40,
+     -30, 5, 10, 15, 15, 10, 5, -30,
+     -30, 0, 15, 20, 20, 15, 0, -30,
+     -30, 5, 15, 20, 20, 15, 5, -30,
+     -30, 0, 10, 15, 15, 10, 0, -30,
+     -40, -20, 0, 0, 0, 0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50],
+    # bishop
+    [-20, -10, -10, -10, -10, -10, -10, -20,
+     -10, 5, 0, 0, 0, 0, 5, -10,
+     -10, 10, 10, 10, 10, 10, 10, -10,
+     -10, 0, 10, 10, 10, 10, 0, -10,
+     -10, 5, 5, 10, 10, 5, 5, -10,
+     -10, 0, 5, 10, 10, 5, 0, -10,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20],
+    # rook
+    [0, 0, 0, 5, 5, 0, 0, 0,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     5, 10, 10, 10, 10, 10, 10, 5,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    # queen
+    [-20, -10, -10, -5, -5, -10, -10, -20,
+     -10, 0, 5, 0, 0, 0, 0, -10,
+     -10, 5, 5, 5, 5, 5, 0, -10,
+     0, 0, 5, 5, 5, 5, 0, -5,
+     -5, 0, 5, 5, 5, 5, 0, -5,
+     -10, 0, 5, 5, 5, 5, 0, -10,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -20, -10, -10, -5, -5, -10, -10, -20],
+    # king
+    [20, 30, 10, 0, 0, 10, 30, 20,
+     20, 20, 0, 0, 0, 0, 20, 20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30],
+], dtype=np.int32)
+
+# centipawns per square a piece attacks that is not occupied by its own side
+MOBILITY_WEIGHTS = np.array([0, 4, 5, 2, 1, 0], dtype=np.int32)
+
+# positions scored per numpy pass, bounds the memory of the mobility arrays to a few tens of MB
+CHUNK_SIZE = 16384
+
+_MATERIAL = np.array(MATERIAL, dtype=np.int32)
+_MIRROR = np.arange(64) ^ 56
+
+# score of every (piece code, square) pair from white's point of view, row 0 is the empty square
+SQUARE_SCORES = np.zeros((13, 64), dtype=np.int32)
+for _piece_type in range(6):
+    SQUARE_SCORES[1 + _piece_type] = _MATERIAL[_piece_type] + PIECE_SQUARE_TABLES[_piece_type]
+    SQUARE_SCORES[7 + _piece_type] = -(_MATERIAL[_piece_type] + PIECE_SQUARE_TABLES[_piece_type][_MIRROR])
+
+
+# the attack tables of bitboard.py as square numbers, square 64 is used as padding for targets off the board
+def _target_table(attacks: list[int]) -> np.ndarray:
+    table = np.full((64, 8), 64, dtype=np.intp)
+    for square in range(64):
+        targets = list(squares_of(attacks[square]))
+        table[square, :len(targets)] = targets
+    return table
+
+
+# rook directions first, then bishop directions, every ray in order of distance from its square
+def _ray_table() -> np.ndarray:
+    table = np.full((64, 8, 7), 64, dtype=np.intp)
+    for direction, rays in enumerate(ORTHOGONAL_RAYS[0] + ORTHOGONAL_RAYS[1] + DIAGONAL_RAYS[0] + DIAGONAL_RAYS[1]):
+        for square in range(64):
+            targets = sorted(squares_of(rays[square]), key=lambda target: abs(target - square))
+            table[square, direction, :len(targets)] = targets
+    return table
+
+
+KNIGHT_TARGETS = _target_table(KNIGHT_ATTACKS)  # (64, 8)
+KING_TARGETS = _target_table(KING_ATTACKS)  # (64, 8)
+RAYS = _ray_table()  # (64, 8 directions, 7 distances)
+
+# which ray directions every piece type slides along
+_SLIDER_DIRECTIONS = np.zeros((6, 8), dtype=bool)
+_SLIDER_DIRECTIONS[2, 4:] = True  # bishop
+_SLIDER_DIRECTIONS[3, :4] = True  # rook
+_SLIDER_DIRECTIONS[4, :] = True  # queen
+
+
+# (N, 64) int8 array of an iterable of BitBoards
+def encode_positions(positions) -> np.ndarray:
+    return np.array([position.mailbox for position in positions], dtype=np.int8) + 1
+
+
+# (N, 12, 64) int8 array with a 1 where a piece index stands on a square
+def one_hot(boards: np.ndarray) -> np.ndarray:
+    return (boards[:, None, :] == np.arange(1, 13, dtype=np.int8)[None, :, None]).astype(np.int8)
+
+
+def _mobility(boards: np.ndarray) -> np.ndarray:
+    count = boards.shape[0]
+    padded = np.zeros((count, 65), dtype=np.int8)
+    padded[:, :64] = boards
+
+    # piece color on every square, -1 for empty squares and -2 for the padding square off the board
+    colors = np.where(padded > 0, (padded - 1) // 6, -1).astype(np.int8)
+    colors[:, 64] = -2
+
+    # only the squares holding a knight, bishop, rook, queen or king are looked at
+    piece_types = np.where(boards > 0, (boards - 1) % 6, -1)
+    rows, squares = np.nonzero(piece_types >= 1)
+    types = piece_types[rows, squares]
+    own_colors = colors[rows, squares]
+    counts = np.zeros(rows.shape[0], dtype=np.int32)
+
+    # knights and kings: every target on the board that is not occupied by an own piece
+    for piece_type, table in ((1, KNIGHT_TARGETS), (5, KING_TARGETS)):
+        selected = types == piece_type
+        targets = colors[rows[selected, None], table[squares[selected]]]  # (M, 8)
+        counts[selected] = ((targets != own_colors[selected, None]) & (targets != -2)).sum(axis=1)
+
+    # sliders: squares along each ray up to and including the first piece, unless it is an own piece
+    selected = (types >= 2) & (types <= 4)
+    targets = colors[rows[selected, None, None], RAYS[squares[selected]]]  # (M, 8 directions, 7 distances)
+    occupied = targets != -1
+    blocked_before = np.zeros_like(occupied)
+    blocked_before[:, :, 1:] = np.logical_or.accumulate(occupied, axis=2)[:, :, :-1]
+    reachable = ~blocked_before & (targets != own_colors[selected, None, None]) & (targets != -2)
+    per_direction = reachable.sum(axis=2)  # (M, 8)
+    counts[selected] = (per_direction * _SLIDER_DIRECTIONS[types[selected]]).sum(axis=1)
+
+    weighted = counts * MOBILITY_WEIGHTS[types] * np.where(own_colors == WHITE, 1, -1)
+    return np.bincount(rows, weights=weighted, minlength=count).astype(np.int32)
+
+
+# scores of encoded positions in centipawns from white's point of view, or from the side to move's if sides
+# (an array of WHITE / BLACK per position) is given
+def evaluate_array(boards: np.ndarray, sides: np.ndarray | None = None, mobility: bool = True) -> np.ndarray:
+    boards = np.asarray(boards, dtype=np.int8)
+    scores = np.empty(boards.shape[0], dtype=np.int32)
+    for start in range(0, boards.shape[0], CHUNK_SIZE):
+        chunk = boards[start:start + CHUNK_SIZE]
+        chunk_scores = SQUARE_SCORES[chunk, np.arange(64)].sum(axis=1)
+        if mobility:
+            chunk_scores += _mobility(chunk)
+        scores[start:start + CHUNK_SIZE] = chunk_scores
+
+    if sides is not None:
+        scores = np.where(np.asarray(sides) == BLACK, -scores, scores)
+    return scores
+
+
+# scores of BitBoards from the side to move's point of view
+def evaluate_batch(positions, mobility: bool = True) -> np.ndarray:
+    positions = list(positions)
+    sides = np.array([position.side for position in positions], dtype=np.int8)
+    return evaluate_array(encode_positions(positions), sides, mobility)
@@ -0,0 +1,215 @@
+# FEN import and export
+#
+# parsing is dominated by the piece placement, so every (rank text, rank number) pair is parsed once and its
+# bitboards, mailbox row and zobrist key are reused for every later position containing the same rank, the
+# bitboards of all ranks are packed into one int that is split into the twelve piece bitboards by a single
+# struct call, and the castling and en passant fields are looked up whole
+#
+# measure parsing speed with: python -m src.fen FILE (one FEN per line)
+import struct
+import sys
+import time
+
+from src.bitboard import *
+from src.zobrist import ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_PIECES, en_passant_key
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+FEN_PIECES = {'P': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4, 'K': 5,
+              'p': 6, 'n': 7, 'b': 8, 'r': 9, 'q': 10, 'k': 11}
+PIECE_CHARACTERS = 'PNBRQKpnbrqk'
+FEN_CASTLING = {'K': WHITE_KINGSIDE, 'Q': WHITE_QUEENSIDE, 'k': BLACK_KINGSIDE, 'q': BLACK_QUEENSIDE}
+PACKED_BITBOARDS = struct.Struct('<12Q')
+
+# every castling field and en passant square a FEN can have
+CASTLING_FIELDS = {'-': 0}
+for rights in range(1, 16):
+    CASTLING_FIELDS[''.join(char for char, right in FEN_CASTLING.items() if rights & right)] = rights
+EN_PASSANT_SQUARES = {'-': EMPTY}
+for file_name in 'abcdefgh':
+    for rank_name in '36':
+        EN_PASSANT_SQUARES[file_name + rank_name] = (ord(rank_name) - 49) * 8 + ord(file_name) - 97
+
+
+# parsed ranks by rank number, bounded so that a file of unusual positions can't grow them forever
+RANK_CACHE: list[dict[str:tuple]] = [dict() for _ in range(8)]
+RANK_CACHE_SIZE = 16384
+
+
+# bitboards of the twelve piece indices packed into one int (piece index i in bits 64 * i to 64 * i + 63),
+# mailbox row and key part of one rank, rank 0 being rank 1
+def parse_rank(text: str, rank: int) -> tuple:
+    cached = RANK_CACHE[rank].get(text)
+    if cached is not None:
+        return cached
+
+    packed = 0
+    row = [EMPTY] * 8
+    key = 0
+    file = 0
+    for char in text:
+        if char in '12345678':
+            file += ord(char) - 48
+            continue
+        index = FEN_PIECES.get(char)
+        if index is None or file > 7:
+            raise ValueError(f'invalid rank {text!r} in FEN')
+        square = rank * 8 + file
+        packed |= 1 << (index * 64 + square)
+        row[file] = index
+        key ^= ZOBRIST_PIECES[index][square]
+        file += 1
+    if file != 8:
+        raise ValueError(f'rank {text!r} in FEN does not have 8 squares')
+
+    if len(RANK_CACHE[rank]) >= RANK_CACHE_SIZE:
+        RANK_CACHE[rank].clear()
+    RANK_CACHE[rank][text] = parsed = (packed, row, key)
+    return parsed
+
+
+# BitBoard of a FEN, the fullmove number is read by parse_fen_counters
+def parse_fen(fen: str) -> BitBoard:
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f'FEN needs at least 4 fields: {fen!r}')
+    try:
+        t8, t7, t6, t5, t4, t3, t2, t1 = fields[0].split('/')
+    except ValueError:
+        raise ValueError(f'FEN placement needs 8 ranks: {fen!r}') from None
+
+    # the most common ranks are found straight in the cache, without a function call
+    c1, c2, c3, c4, c5, c6, c7, c8 = RANK_CACHE
+    r8 = c8.get(t8) or parse_rank(t8, 7)
+    r7 = c7.get(t7) or parse_rank(t7, 6)
+    r6 = c6.get(t6) or parse_rank(t6, 5)
+    r5 = c5.get(t5) or parse_rank(t5, 4)
+    r4 = c4.get(t4) or parse_rank(t4, 3)
+    r3 = c3.get(t3) or parse_rank(t3, 2)
+    r2 = c2.get(t2) or parse_rank(t2, 1)
+    r1 = c1.get(t1) or parse_rank(t1, 0)
+
+    # every field is set here, so the BitBoard is made without the default values of __init__
+    position = BitBoard.__new__(BitBoard)
+    packed = r1[0] | r2[0] | r3[0] | r4[0] | r5[0] | r6[0] | r7[0] | r8[0]
+    position.pieces = pieces = list(PACKED_BITBOARDS.unpack(packed.to_bytes(768 // 8, 'little')))
+    position.mailbox = [*r1[1], *r2[1], *r3[1], *r4[1], *r5[1], *r6[1], *r7[1], *r8[1]]
+    white = pieces[0] | pieces[1] | pieces[2] | pieces[3] | pieces[4] | pieces[5]
+    black = pieces[6] | pieces[7] | pieces[8] | pieces[9] | pieces[10] | pieces[11]
+    position.occupancy = [white, black, white | black]
+    position.history = list()
+    position.repetitions = dict()
+
+    # the move generator trusts the board, e.g. that a king can always be found
+    if pieces[KING].bit_count() != 1 or pieces[6 + KING].bit_count() != 1:
+        raise ValueError(f'FEN needs exactly one king of each color: {fen!r}')
+    if (pieces[PAWN] | pieces[6 + PAWN]) & (RANK_1 | RANK_8):
+        raise ValueError(f'pawn on the first or last rank in FEN: {fen!r}')
+
+    key = r1[2] ^ r2[2] ^ r3[2] ^ r4[2] ^ r5[2] ^ r6[2] ^ r7[2] ^ r8[2]
+
+    side = fields[1]
+    if side == 'w':
+        position.side = WHITE
+    elif side == 'b':
+        position.side = BLACK
+        key ^= ZOBRIST_BLACK_TO_MOVE
+    else:
+        raise ValueError(f'invalid side to move in FEN: {fen!r}')
+
+    castling = CASTLING_FIELDS.get(fields[2])
+    if castling is None:  # rights in an unusual order, such as 'qkQK'
+        castling = 0
+        for char in fields[2]:
+            if char not in FEN_CASTLING:
+                raise ValueError(f'invalid castling rights in FEN: {fen!r}')
+            castling |= FEN_CASTLING[char]
+    if castling:
+        # a right is dropped unless its king and rook are still on their starting squares, castling would
+        # otherwise move a rook that isn't there
+        white_rooks, black_rooks = pieces[ROOK], pieces[6 + ROOK]
+        allowed = (white_rooks >> 7 & 1) * WHITE_KINGSIDE | (white_rooks & 1) * WHITE_QUEENSIDE
+        allowed *= pieces[KING] >> 4 & 1
+        black_allowed = (black_rooks >> 63 & 1) * BLACK_KINGSIDE | (black_rooks >> 56 & 1) * BLACK_QUEENSIDE
+        castling &= allowed | black_allowed * (pieces[6 + KING] >> 60 & 1)
+    position.castling = castling
+
+    en_passant = EN_PASSANT_SQUARES.get(fields[3])
+    if en_passant is None:
+        raise ValueError(f'invalid en passant square in FEN: {fen!r}')
+    if en_passant != EMPTY:
+        # the square a pawn of the other side just skipped: on the side's sixth rank, empty, with the pawn in
+        # front of it and its starting square empty
+        forward = 8 if position.side == WHITE else -8
+        mailbox = position.mailbox
+        if en_passant // 8 != (5 if position.side == WHITE else 2) or mailbox[en_passant] != EMPTY or \
+                mailbox[en_passant - forward] != (1 - position.side) * 6 + PAWN or \
+                mailbox[en_passant + forward] != EMPTY:
+            raise ValueError(f'no pawn can be captured en passant on {fields[3]} in FEN: {fen!r}')
+    position.en_passant = en_passant
+
+    position.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    position.key = key ^ ZOBRIST_CASTLING[castling] ^ en_passant_key(en_passant, pieces[position.side * 6 + PAWN])
+    return position
+
+
+# (halfmove clock, fullmove number) of a FEN, (0, 1) if they are left out
+def parse_fen_counters(fen: str) -> tuple:
+    fields = fen.split()
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+    return halfmove_clock, fullmove_number
+
+
+# parses FENs lazily, e.g. straight from the lines of a file, blank lines are skipped
+def parse_fens(fens):
+    for fen in fens:
+        fen = fen.strip()
+        if fen:
+            yield parse_fen(fen)
+
+
+def to_fen(position: BitBoard, fullmove_number: int = 1) -> str:
+    ranks: list[str] = list()
+    mailbox = position.mailbox
+    for rank in range(7, -1, -1):
+        text = ''
+        empty = 0
+        for index in mailbox[rank * 8:rank * 8 + 8]:
+            if index == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            text += PIECE_CHARACTERS[index]
+        if empty:
+            text += str(empty)
+        ranks.append(text)
+
+    castling = ''.join(char for char, right in FEN_CASTLING.items() if position.castling & right) or '-'
+    en_passant = '-'
+    if position.en_passant != EMPTY:
+        en_passant = 'abcdefgh'[position.en_passant % 8] + str(position.en_passant // 8 + 1)
+    side = 'w' if position.side == WHITE else 'b'
+    return f'{"/".join(ranks)} {side} {castling} {en_passant} {position.halfmove_clock} {fullmove_number}'
+
+
+def main(arguments: list[str] | None = None) -> int:
+    arguments = sys.argv[1:] if arguments is None else arguments
+    if not arguments:
+        print('usage: python -m src.fen FILE')
+        return 2
+
+    start = time.perf_counter()
+    count = 0
+    with open(arguments[0]) as file:
+        for _ in parse_fens(file):
+            count += 1
+    seconds = time.perf_counter() - start
+    print(f'{count} FENs in {seconds:.3f}s, {count / seconds if seconds else 0:.0f} FENs per second')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
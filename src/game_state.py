@@ -0,0 +1,155 @@
+# rules of the game without any display, safe to import on machines without pygame or a screen
+from src.bitboard import *
+from src.fen import parse_fen, parse_fen_counters, to_fen
+from src.pgn import game_pgn
+
+
+class GameState:
+    def __init__(self, position: BitBoard | None = None, fullmove_number: int = 1):
+        self.position: BitBoard = position if position is not None else BitBoard.starting_position()
+
+        # fullmove number of the starting position, as given in its FEN
+        self.start_fullmove_number: int = fullmove_number
+        self.start_side: int = self.position.side
+
+        # every move applied so far, encoded with encode_move
+        self.moves_played: list[int] = list()
+
+        # legal moves of the position with key cached_key, generated once per ply and reused by highlighting,
+        # click handling and status checks until a move is applied
+        self.cached_key: int | None = None
+        self.cached_moves: list[int] = list()
+        self.moves_from: dict[int:list[tuple]] = dict()  # tiles every square of the side to move can go to
+        self.other_side_places: dict[int:list[tuple]] = dict()  # same for the side not to move, filled lazily
+
+        # journal.GameJournal every applied and taken back move is written to, None to keep the game in memory only
+        self.journal = None
+
+    @classmethod
+    def from_fen(cls, fen: str):
+        return cls(parse_fen(fen), parse_fen_counters(fen)[1])
+
+    def fen(self) -> str:
+        return to_fen(self.position, self.start_fullmove_number + (len(self.moves_played) + self.start_side) // 2)
+
+    # PGN text of the moves played so far, tags are added to the header
+    def pgn(self, tags: dict | None = None) -> str:
+        start = self.position.copy()
+        for _ in self.moves_played:
+            start.unmake_move()
+        return game_pgn(self.moves_played, tags, start, self.start_fullmove_number)
+
+    # 'white' or 'black'
+    @property
+    def player_turn(self) -> str:
+        return COLOR_NAMES[self.position.side]
+
+    # zobrist key identifying the position, including side to move, castling rights and en passant
+    @property
+    def key(self) -> int:
+        return self.position.key
+
+    # tile (x, y) a pawn can capture to en passant, None if the last move was not a pawn jump
+    @property
+    def en_passant_tile(self) -> tuple | None:
+        if self.position.en_passant == EMPTY:
+            return None
+        return location_of(self.position.en_passant)
+
+    # returns (piece type, color) of the piece at a tile, or None if the tile is empty
+    def piece_at(self, x, y) -> tuple | None:
+        piece = self.position.piece_at(square_of(x, y))
+        if piece is None:
+            return None
+        color, piece_type = piece
+        return PIECE_NAMES[piece_type], COLOR_NAMES[color]
+
+    # yields (x, y, piece type, color) of every piece on the board
+    def pieces(self):
+        for square, index in enumerate(self.position.mailbox):
+            if index != EMPTY:
+                x, y = location_of(square)
+                yield x, y, PIECE_NAMES[index % 6], COLOR_NAMES[index // 6]
+
+    # tiles the piece at (x, y) can move to, pieces of the player that is not on turn show where they could
+    # move if it was their turn
+    def possible_places(self, x, y) -> list[tuple]:
+        square = square_of(x, y)
+        piece = self.position.piece_at(square)
+        if piece is None:
+            return []
+
+        self.moves()  # make sure the cache belongs to the current position
+        if piece[0] != self.position.side:
+            if square not in self.other_side_places:
+                places = [location_of(target) for target in self.position.possible_places(square)]
+                self.other_side_places[square] = places
+            return self.other_side_places[square]
+        return self.moves_from.get(square, [])
+
+    # all legal moves of the side to move, encoded with encode_move, the list is shared and must not be changed
+    def moves(self) -> list[int]:
+        if self.cached_key != self.position.key:
+            self.build_move_cache()
+        return self.cached_moves
+
+    def build_move_cache(self):
+        self.cached_moves = self.position.legal_moves()
+        self.moves_from = dict()
+        self.other_side_places = dict()
+        for move in self.cached_moves:
+            if move_promotion(move) in (0, QUEEN):
+                self.moves_from.setdefault(move_from(move), list()).append(location_of(move_to(move)))
+        self.cached_key = self.position.key
+
+    def invalidate_moves(self):
+        self.cached_key = None
+
+    def in_check(self) -> bool:
+        return self.position.in_check()
+
+    # 'checkmate', 'stalemate', 'insufficient_material', 'threefold_repetition', 'fifty_moves' or 'ongoing', draws
+    # that could be claimed end the game
+    def status(self) -> str:
+        if not self.moves():
+            return 'checkmate' if self.in_check() else 'stalemate'
+        if self.position.insufficient_material():
+            return 'insufficient_material'
+        return self.position.draw_claim() or 'ongoing'
+
+    # 'white' or 'black' if a player has been checkmated, None otherwise
+    def winner(self) -> str | None:
+        if self.status() == 'checkmate':
+            return COLOR_NAMES[1 - self.position.side]
+        return None
+
+    def make_move(self, move: int):
+        self.position.make_move(move)
+        self.moves_played.append(move)
+        self.invalidate_moves()
+        if self.journal is not None:
+            self.journal.record_move(self, move)
+
+    # takes back the last move, returns False if no move has been played
+    def undo(self) -> bool:
+        if not self.moves_played:
+            return False
+        self.position.unmake_move()
+        self.moves_played.pop()
+        self.invalidate_moves()
+        if self.journal is not None:
+            self.journal.record_undo(self)
+        return True
+
+    # moves the piece at from_tile to to_tile if it is the player's turn and the move is allowed,
+    # returns whether the move was played
+    def move(self, from_tile: tuple, to_tile: tuple, promotion: str = 'queen') -> bool:
+        from_square, to_square = square_of(*from_tile), square_of(*to_tile)
+
+        promotion = PIECE_NAMES.index(promotion)
+        for move in self.moves():
+            if move_from(move) == from_square and move_to(move) == to_square and \
+                    move_promotion(move) in (0, promotion):
+                self.make_move(move)
+                return True
+        return False
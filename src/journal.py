@@ -0,0 +1,334 @@
+# crash-safe persistence of a game: every applied move is appended to a binary journal, and a snapshot of the
+# game is written next to it every few plies, so resuming only replays the moves after the last snapshot
+#
+# journal: magic, the length and FEN of the starting position, then one little-endian 16-bit record per move
+# applied (the encoded move) or taken back (UNDO)
+# history (FILE.history): the undo records of BitBoard.history, one HISTORY record per move on the board, only
+# rewritten from the first record that changed since the last snapshot, so writing it costs the moves since
+# then and not the length of the game
+# snapshot (FILE.snapshot): magic, the journal size it covers with the CRC-32 of the journal up to there, the
+# number of history records with their CRC-32 and the FEN of the position, replaced atomically so that a crash
+# leaves either the old or the new one
+#
+# resuming parses the FEN of the snapshot, takes the undo records (and with them the repetition counts) from
+# the history file and replays only the journal records after the snapshot, so every move can still be taken
+# back and repetitions reaching back before the snapshot are found, a snapshot whose checksums don't match
+# (another game at the same path, a crash while writing the history) is ignored and the whole journal replayed
+#
+# the journal is flushed after every record and synced to disk every sync_every records (0 leaves it to the
+# operating system), a torn record at the end from a crash is cut off when resuming
+#
+# run with: python -m src.journal FILE [--play PLIES] [--sync-every N] [--snapshot-every N]
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+from src.bitboard import BLACK, WHITE
+from src.fen import STARTING_FEN, parse_fen, parse_fen_counters
+from src.game_state import GameState
+
+MAGIC = b'CJN1'
+SNAPSHOT_MAGIC = b'CJS2'
+LENGTH = struct.Struct('<H')
+RECORD = struct.Struct('<H')
+SNAPSHOT = struct.Struct('<QIII')  # journal size and its CRC-32, number of history records and their CRC-32
+HISTORY = struct.Struct('<HbbbBIQ')  # move, moved, captured, en passant, castling, halfmove clock, key
+UNDO = 0xFFFF  # never a valid move, moves take at most 15 bits
+
+JOURNAL_SYNC_EVERY = 1  # records between syncs to disk, 0 to never sync explicitly
+JOURNAL_SNAPSHOT_EVERY = 64  # plies between snapshots, 0 for none
+
+
+class JournalError(ValueError):
+    pass
+
+
+class GameJournal:
+    # appends to an existing journal whose bytes up to size are valid and have the CRC-32 checksum, that is ply
+    # moves into the game and whose first history_checksums - 1 undo records are in the history file, with
+    # history_checksums[n] the CRC-32 of the first n of them
+    def __init__(self, path: str, size: int, checksum: int, ply: int, snapshot_ply: int = 0,
+                 history_checksums: list[int] | None = None,
+                 sync_every: int = JOURNAL_SYNC_EVERY, snapshot_every: int = JOURNAL_SNAPSHOT_EVERY):
+        self.path: str = path
+        self.file = open(path, 'r+b')
+        self.file.truncate(size)  # drops a torn record left by a crash
+        self.file.seek(size)
+        self.checksum: int = checksum
+
+        self.ply: int = ply
+        self.snapshot_ply: int = snapshot_ply
+        self.sync_every: int = sync_every
+        self.snapshot_every: int = snapshot_every
+        self.unsynced: int = 0
+
+        self.history_file = None  # opened by the first snapshot
+        self.history_checksums: list[int] = history_checksums if history_checksums is not None else [0]
+
+    # starts a journal for a game, replacing any journal at path, the old snapshot is removed first so that a
+    # crash in between can't leave it next to the new journal
+    @classmethod
+    def create(cls, path: str, game: GameState, **settings):
+        remove_file(snapshot_path(path))
+        remove_file(history_path(path))
+        fen = game.fen().encode()
+        header = MAGIC + LENGTH.pack(len(fen)) + fen
+        with open(path, 'wb') as file:
+            file.write(header)
+            file.flush()
+            os.fsync(file.fileno())
+        return cls(path, len(header), zlib.crc32(header), 0, **settings)
+
+    def record_move(self, game: GameState, move: int):
+        self.append(move)
+        self.ply += 1
+        if self.snapshot_every and self.ply - self.snapshot_ply >= self.snapshot_every:
+            self.snapshot(game)
+
+    def record_undo(self, game: GameState):
+        self.append(UNDO)
+        self.ply -= 1
+        # the undo record on top of the history is gone, it has to be written again at the next snapshot
+        del self.history_checksums[self.ply + 1:]
+
+    def append(self, record: int):
+        data = RECORD.pack(record)
+        self.file.write(data)
+        self.file.flush()
+        self.checksum = zlib.crc32(data, self.checksum)
+        self.unsynced += 1
+        if self.sync_every and self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    # writes the game as the new starting point for resuming, after the journal and the history it refers to
+    # are on disk, only the undo records added since the last snapshot are written
+    def snapshot(self, game: GameState):
+        self.sync()
+        history = game.position.history
+        checksums = self.history_checksums
+        written = len(checksums) - 1
+        if self.history_file is None:
+            self.history_file = open(history_path(self.path), 'r+b' if os.path.exists(history_path(self.path))
+                                     else 'w+b')
+        self.history_file.truncate(written * HISTORY.size)
+        self.history_file.seek(written * HISTORY.size)
+        for record in history[written:]:
+            data = HISTORY.pack(*record)
+            self.history_file.write(data)
+            checksums.append(zlib.crc32(data, checksums[-1]))
+        self.history_file.flush()
+        os.fsync(self.history_file.fileno())
+
+        fen = game.fen().encode()
+        temporary = snapshot_path(self.path) + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(SNAPSHOT_MAGIC + SNAPSHOT.pack(self.file.tell(), self.checksum, len(history), checksums[-1]) +
+                       LENGTH.pack(len(fen)) + fen)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, snapshot_path(self.path))
+        self.snapshot_ply = self.ply
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+        if self.history_file is not None:
+            self.history_file.close()
+
+    # closes the journal and removes its files, the journal itself last so that a crash part way leaves a game
+    # that can still be resumed
+    def delete(self):
+        self.close()
+        remove_file(snapshot_path(self.path))
+        remove_file(history_path(self.path))
+        remove_file(self.path)
+
+
+def snapshot_path(path: str) -> str:
+    return path + '.snapshot'
+
+
+def history_path(path: str) -> str:
+    return path + '.history'
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# (journal size, journal CRC-32, history records, history CRC-32, FEN) of the snapshot of a journal, None if
+# there is none or it is unreadable
+def read_snapshot(path: str) -> tuple | None:
+    try:
+        with open(snapshot_path(path), 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    header = len(SNAPSHOT_MAGIC) + SNAPSHOT.size + LENGTH.size
+    if len(data) < header or not data.startswith(SNAPSHOT_MAGIC):
+        return None
+    length, = LENGTH.unpack_from(data, header - LENGTH.size)
+    if len(data) != header + length:
+        return None
+    return *SNAPSHOT.unpack_from(data, len(SNAPSHOT_MAGIC)), data[header:].decode()
+
+
+# (the first count undo records of the history file, CRC-32 of the first n records for every n), JournalError
+# if they are missing or their checksum isn't the expected one
+def read_history(path: str, count: int, checksum: int) -> tuple:
+    try:
+        with open(history_path(path), 'rb') as file:
+            data = file.read(count * HISTORY.size)
+    except FileNotFoundError:
+        raise JournalError('no history file') from None
+    if len(data) != count * HISTORY.size:
+        raise JournalError('truncated history file')
+
+    checksums = [0]
+    for offset in range(0, len(data), HISTORY.size):
+        checksums.append(zlib.crc32(data[offset:offset + HISTORY.size], checksums[-1]))
+    if checksums[-1] != checksum:
+        raise JournalError('history file does not match the snapshot')
+    return list(HISTORY.iter_unpack(data)), checksums
+
+
+# (starting FEN, offset of the first record) of a journal
+def read_header(data: bytes) -> tuple:
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + LENGTH.size:
+        raise JournalError('not a game journal')
+    length, = LENGTH.unpack_from(data, len(MAGIC))
+    start = len(MAGIC) + LENGTH.size
+    if len(data) < start + length:
+        raise JournalError('truncated journal header')
+    return data[start:start + length].decode(), start + length
+
+
+# the game of a snapshot: its position with the undo records of every move played since the starting position
+def restore(start_fen: str, fen: str, history: list[tuple]) -> GameState:
+    position = parse_fen(fen)
+    position.history = history
+    for record in history:
+        position.repetitions[record[6]] = position.repetitions.get(record[6], 0) + 1
+
+    game = GameState(position, parse_fen_counters(start_fen)[1])
+    game.start_side = BLACK if start_fen.split()[1] == 'b' else WHITE
+    game.moves_played = [record[0] for record in history]
+    if game.fen() != fen:
+        raise JournalError('snapshot does not match the journal')
+    return game
+
+
+# applies the records of data from offset on to game, returns the offset after the last one applied, stops
+# with a JournalError at a record that cannot be applied
+def replay_records(game: GameState, data: bytes, offset: int) -> int:
+    end = offset + (len(data) - offset) // RECORD.size * RECORD.size
+    for offset in range(offset, end, RECORD.size):
+        record, = RECORD.unpack_from(data, offset)
+        if record == UNDO:
+            if not game.undo():
+                raise JournalError(f'take back without a move at byte {offset}')
+        elif record in game.moves():
+            game.make_move(record)
+        else:
+            raise JournalError(f'illegal move at byte {offset}')
+    return end
+
+
+# loads the game of a journal from its latest snapshot and the moves after it, and attaches the journal to the
+# game so that further moves are recorded
+def resume(path: str, **settings) -> GameState:
+    with open(path, 'rb') as file:
+        data = file.read()
+    fen, first_record = read_header(data)
+
+    snapshot = read_snapshot(path)
+    if snapshot is not None:
+        size, checksum, count, history_checksum, snapshot_fen = snapshot
+        try:
+            # a snapshot left by another game at the same path has another checksum
+            if not first_record <= size <= len(data) or (size - first_record) % RECORD.size or \
+                    zlib.crc32(data[:size]) != checksum:
+                raise JournalError('snapshot does not match the journal')
+            history, history_checksums = read_history(path, count, history_checksum)
+            game = restore(fen, snapshot_fen, history.copy())
+            end = replay_records(game, data, size)
+
+            # undo records taken back after the snapshot have to be written again by the next one
+            written = min(count, len(game.position.history))
+            while written and game.position.history[written - 1] is not history[written - 1]:
+                written -= 1
+            del history_checksums[written + 1:]
+
+            game.journal = GameJournal(path, end, zlib.crc32(data[size:end], checksum), len(game.moves_played),
+                                       count, history_checksums, **settings)
+            return game
+        except ValueError:
+            pass  # a damaged snapshot (JournalError or a bad FEN), the journal alone has everything
+
+    # no usable snapshot, replay the whole game
+    game = GameState.from_fen(fen)
+    end = replay_records(game, data, first_record)
+    game.journal = GameJournal(path, end, zlib.crc32(data[:end]), len(game.moves_played), **settings)
+    return game
+
+
+# resumes the game of the journal at path if there is one, otherwise starts a new game from fen and journals it
+def open_game(path: str, fen: str | None = None, **settings) -> GameState:
+    if os.path.exists(path):
+        return resume(path, **settings)
+    game = GameState.from_fen(fen) if fen else GameState()
+    game.journal = GameJournal.create(path, game, **settings)
+    return game
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure writing and resuming a game journal.')
+    parser.add_argument('path', help='journal file')
+    parser.add_argument('--play', type=int, default=0, metavar='PLIES',
+                        help='first play this many random moves into a new journal at path')
+    parser.add_argument('--sync-every', type=int, default=JOURNAL_SYNC_EVERY)
+    parser.add_argument('--snapshot-every', type=int, default=JOURNAL_SNAPSHOT_EVERY)
+    arguments = parser.parse_args(sys.argv[1:] if arguments is None else arguments)
+    settings = {'sync_every': arguments.sync_every, 'snapshot_every': arguments.snapshot_every}
+
+    if arguments.play:
+        remove_file(arguments.path)
+        game = open_game(arguments.path, STARTING_FEN, **settings)
+        generator = random.Random(0)
+        start = time.perf_counter()
+        for _ in range(arguments.play):
+            moves = game.moves()
+            if not moves:
+                break
+            game.make_move(generator.choice(moves))
+        game.journal.close()
+        elapsed = time.perf_counter() - start
+        print(f'played {len(game.moves_played)} plies in {elapsed:.3f}s '
+              f'({elapsed / max(len(game.moves_played), 1) * 1e6:.0f} us per move, move generation included)')
+
+    start = time.perf_counter()
+    game = resume(arguments.path, **settings)
+    elapsed = time.perf_counter() - start
+    print(f'resumed at ply {game.journal.ply} (snapshot at ply {game.journal.snapshot_ply}, '
+          f'{len(game.moves_played)} moves can be taken back) '
+          f'in {elapsed * 1000:.2f} ms: {game.fen()}')
+    game.journal.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# lazy SMP: several processes search the same position at once and share one transposition table placed
+# in shared memory, so each process profits from what the others already searched
+#
+# run a time-to-depth comparison with: python -m src.parallel_search --depth 5 --workers 4 [--fen FEN]
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from multiprocessing import connection, shared_memory
+
+from src.bitboard import *
+from src.fen import STARTING_FEN, parse_fen
+from src.search import MAX_PLY, Search
+from src.transposition import ENTRY_BYTES, TranspositionTable
+
+RESULT_TIMEOUT = 0.5  # seconds between checks that the workers still waited for are alive
+
+
+def worker_main(worker_id: int, memory_name: str, requests, results, stop_event):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    search = Search(TranspositionTable(buffer=memory.buf), stop_event)
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            request_id, position, limits = request
+
+            # half of the helpers start one depth deeper, so the processes don't all search the same tree
+            start_depth = 1 + worker_id % 2 if worker_id else 1
+            result = search.search(position, start_depth=start_depth, **limits)
+            results.send((request_id, result))
+    finally:
+        del search
+        memory.close()
+
+
+class ParallelSearch:
+    def __init__(self, workers: int = multiprocessing.cpu_count(), hash_mb: float = 64):
+        self.workers: int = max(workers, 1)
+
+        entries = 1 << (max(int(hash_mb * 1024 * 1024) // ENTRY_BYTES, 1).bit_length() - 1)
+        self.memory = shared_memory.SharedMemory(create=True, size=entries * ENTRY_BYTES)
+        self.memory.buf[:] = bytes(self.memory.size)
+
+        self.stop_event = multiprocessing.Event()
+        # every worker answers through a pipe of its own, a worker that dies part way through an answer then
+        # only breaks its own pipe instead of a lock shared by all of them
+        self.results: list[connection.Connection] = list()
+        self.requests: list = list()
+        self.processes: list[multiprocessing.Process] = list()
+        for worker_id in range(self.workers):
+            requests = multiprocessing.Queue()
+            results, worker_results = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=worker_main, daemon=True,
+                                              args=(worker_id, self.memory.name, requests, worker_results,
+                                                    self.stop_event))
+            process.start()
+            worker_results.close()  # so that the pipe reports the end once the worker is gone
+            self.requests.append(requests)
+            self.results.append(results)
+            self.processes.append(process)
+
+        self.request_id: int = 0
+
+    # searches with every worker, returns the result of the main worker (id 0) once it finishes, with the
+    # node count of all workers added together, workers that died are left out and if the main worker is one
+    # of them the deepest result of a helper is returned instead
+    def search(self, position: BitBoard, max_depth: int = MAX_PLY, time_limit: float | None = None,
+               node_limit: int | None = None) -> dict:
+        self.request_id += 1
+        self.stop_event.clear()
+
+        position = position.copy()
+        position.trim_history()  # only the moves that can still be repeated are needed
+        limits = {'max_depth': max_depth, 'time_limit': time_limit, 'node_limit': node_limit}
+        start = time.perf_counter()
+        waiting = {worker_id for worker_id, process in enumerate(self.processes) if process.is_alive()}
+        for worker_id in waiting:
+            self.requests[worker_id].put((self.request_id, position, limits))
+
+        main_result = None
+        helper_results = list()
+        nodes = 0
+        while waiting:
+            ready = connection.wait([self.results[worker_id] for worker_id in waiting], timeout=RESULT_TIMEOUT)
+            for worker_id in sorted(waiting):
+                results = self.results[worker_id]
+                if results in ready:
+                    try:
+                        request_id, result = results.recv()
+                    except EOFError:  # the worker died, maybe part way through its answer
+                        result = None
+                    else:
+                        if request_id != self.request_id:
+                            continue
+                elif ready or self.processes[worker_id].is_alive():
+                    continue
+                else:
+                    result = None  # the worker died without answering, checked only once no answer came in time
+
+                waiting.discard(worker_id)
+                if result is None:
+                    if worker_id == 0:
+                        self.stop_event.set()
+                elif worker_id == 0:
+                    # the main worker is done, the helpers only need to stop and report their node counts
+                    nodes += result['nodes']
+                    main_result = result
+                    self.stop_event.set()
+                else:
+                    nodes += result['nodes']
+                    helper_results.append(result)
+
+        if main_result is None:
+            if not helper_results:
+                raise RuntimeError('every search worker died')
+            main_result = max(helper_results, key=lambda result: result['depth'])
+        elapsed = time.perf_counter() - start
+        main_result['nodes'] = nodes
+        main_result['time'] = round(elapsed, 4)
+        main_result['nps'] = round(nodes / elapsed) if elapsed > 0 else 0
+        return main_result
+
+    def clear(self):
+        self.memory.buf[:] = bytes(self.memory.size)
+
+    def close(self):
+        self.stop_event.set()
+        for requests in self.requests:
+            requests.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+        for results in self.results:
+            results.close()
+        self.memory.close()
+        self.memory.unlink()
+
+
+# time to reach a depth with a single process and with the given number of workers
+def compare(position: BitBoard, depth: int, workers: int, hash_mb: float) -> dict:
+    start = time.perf_counter()
+    single = Search(TranspositionTable(hash_mb)).search(position.copy(), max_depth=depth)
+    single_time = time.perf_counter() - start
+
+    parallel_search = ParallelSearch(workers, hash_mb)
+    try:
+        start = time.perf_counter()
+        parallel = parallel_search.search(position, max_depth=depth)
+        parallel_time = time.perf_counter() - start
+    finally:
+        parallel_search.close()
+
+    return {
+        'depth': depth,
+        'workers': workers,
+        'single_seconds': round(single_time, 4),
+        'single_nodes': single['nodes'],
+        'single_best_move': move_name(single['best_move']),
+        'parallel_seconds': round(parallel_time, 4),
+        'parallel_nodes': parallel['nodes'],
+        'parallel_best_move': move_name(parallel['best_move']),
+        'speedup': round(single_time / parallel_time, 3) if parallel_time > 0 else 0,
+    }
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare single-process and parallel time to depth.')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--hash', type=float, default=64, help='transposition table size in MB')
+    parser.add_argument('--fen', default=STARTING_FEN)
+    arguments = parser.parse_args(arguments)
+
+    result = compare(parse_fen(arguments.fen), arguments.depth, arguments.workers, arguments.hash)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# counts the leaf nodes of the move tree and compares them with the known counts of standard positions,
+# run with: python -m src.perft --depth 3 [--position kiwipete] [--json results.json]
+import argparse
+import json
+import sys
+import time
+
+from src.bitboard import *
+from src.fen import parse_fen
+
+# name, FEN and the known node counts for depth 1, 2, 3, ...
+PERFT_POSITIONS = (
+    ('startpos', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     (20, 400, 8902, 197281, 4865609)),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     (48, 2039, 97862, 4085603)),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     (14, 191, 2812, 43238, 674624)),
+    ('promotions', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     (6, 264, 9467, 422333)),
+    ('discovered_check', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     (44, 1486, 62379, 2103487)),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     (46, 2079, 89890, 3894594)),
+)
+
+
+def perft(position: BitBoard, depth: int) -> int:
+    if depth <= 0:  # the position itself is the only leaf
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+# node count below every root move, used to find which move a wrong total comes from
+def divide(position: BitBoard, depth: int) -> dict[int:int]:
+    result: dict[int:int] = dict()
+    for move in position.legal_moves():
+        position.make_move(move)
+        result[move] = perft(position, depth - 1) if depth > 1 else 1
+        position.unmake_move()
+    return result
+
+
+# runs every depth up to max_depth on a position, returns one result per depth
+def run_position(name: str, fen: str, expected: tuple, max_depth: int) -> list[dict]:
+    results: list[dict] = list()
+    position = parse_fen(fen)
+    for depth in range(1, min(max_depth, len(expected)) + 1):
+        start = time.perf_counter()
+        nodes = perft(position, depth)
+        seconds = time.perf_counter() - start
+
+        results.append({
+            'position': name,
+            'depth': depth,
+            'nodes': nodes,
+            'expected': expected[depth - 1],
+            'passed': nodes == expected[depth - 1],
+            'seconds': round(seconds, 6),
+            'nodes_per_second': round(nodes / seconds) if seconds > 0 else 0,
+        })
+    return results
+
+
+# argparse type of --depth
+def depth_argument(text: str) -> int:
+    depth = int(text)
+    if depth < 0:
+        raise argparse.ArgumentTypeError(f'depth must not be negative: {depth}')
+    return depth
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Move generator correctness and speed test.')
+    parser.add_argument('--depth', type=depth_argument, default=3, help='deepest depth to search')
+    parser.add_argument('--position', action='append', help='only run the named position (repeatable)')
+    parser.add_argument('--fen', help='run a custom position instead, prints node counts only')
+    parser.add_argument('--divide', action='store_true', help='with --fen, print the node count of every root move')
+    parser.add_argument('--json', help='write results as JSON to this file, - for stdout')
+    arguments = parser.parse_args(arguments)
+    if arguments.divide and not arguments.depth:
+        parser.error('--divide needs a depth of at least 1')
+
+    if arguments.fen:
+        position = parse_fen(arguments.fen)
+        if arguments.divide:
+            counts = divide(position, arguments.depth)
+            for move, nodes in sorted(counts.items(), key=lambda item: move_name(item[0])):
+                print(f'{move_name(move)}: {nodes}')
+            print(f'total: {sum(counts.values())}')
+        else:
+            print(perft(position, arguments.depth))
+        return 0
+
+    results: list[dict] = list()
+    for name, fen, expected in PERFT_POSITIONS:
+        if arguments.position and name not in arguments.position:
+            continue
+        for result in run_position(name, fen, expected, arguments.depth):
+            results.append(result)
+            if arguments.json != '-':
+                status = 'ok' if result['passed'] else f'FAILED (expected {result["expected"]})'
+                print(f'{name:<18} depth {result["depth"]}: {result["nodes"]:>10} nodes '
+                      f'{result["seconds"]:>9.3f}s {result["nodes_per_second"]:>9} nps  {status}')
+
+    if arguments.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif arguments.json:
+        with open(arguments.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    return 0 if all(result['passed'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+# PGN reading and writing
+#
+# games are read one at a time from any iterable of lines (e.g. an open file), so archives of any size are
+# replayed with the memory of a single game, SAN moves are resolved by looking only at the pieces that can
+# reach the target square instead of generating every legal move of the position
+#
+# measure replay speed with: python -m src.pgn FILE
+import re
+import sys
+import time
+
+from src.bitboard import *
+from src.fen import STARTING_FEN, parse_fen, to_fen
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+# tags every exported game starts with, in this order
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+SAN_PIECES = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+SAN_LETTERS = ('', 'N', 'B', 'R', 'Q', 'K')
+
+# the value runs to the last quote, so unescaped quotes written by other tools are kept as well
+TAG_PATTERN = re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]')
+SAN_PATTERN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+# comments, variations, move numbers, NAGs and results are skipped, everything else is a move
+TOKEN_PATTERN = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+|\d+\.+|[()]|[^\s{}();$.]+')
+
+# parsed SAN text: (piece type, from mask, to square, promotion), castling uses the KING type with the
+# from mask set to CASTLE_KINGSIDE or CASTLE_QUEENSIDE and the to square of white
+CASTLE_KINGSIDE = -1
+CASTLE_QUEENSIDE = -2
+SAN_CACHE: dict[str:tuple] = dict()
+SAN_CACHE_SIZE = 65536
+
+
+def parse_san_text(san: str) -> tuple:
+    cached = SAN_CACHE.get(san)
+    if cached is not None:
+        return cached
+
+    text = san.rstrip('+#!?')
+    if text in ('O-O', '0-0'):
+        parsed = (KING, CASTLE_KINGSIDE, 6, 0)
+    elif text in ('O-O-O', '0-0-0'):
+        parsed = (KING, CASTLE_QUEENSIDE, 2, 0)
+    else:
+        match = SAN_PATTERN.match(text)
+        if match is None:
+            raise ValueError(f'invalid SAN move {san!r}')
+        piece, file, rank, target, promotion = match.groups()
+        from_mask = FULL
+        if file:
+            from_mask &= FILE_A << ord(file) - 97
+        if rank:
+            from_mask &= RANK_1 << (ord(rank) - 49) * 8
+        to_square = (ord(target[1]) - 49) * 8 + ord(target[0]) - 97
+        parsed = (SAN_PIECES[piece] if piece else PAWN, from_mask, to_square,
+                  SAN_PIECES[promotion] if promotion else 0)
+
+    if len(SAN_CACHE) >= SAN_CACHE_SIZE:
+        SAN_CACHE.clear()
+    SAN_CACHE[san] = parsed
+    return parsed
+
+
+# bitboard of the pieces of a type of the side to move that could move to a square, not taking checks into
+# account, the attacks are looked up backwards from the target square
+def candidates(position: BitBoard, piece_type: int, to_square: int) -> int:
+    side = position.side
+    pieces = position.pieces[side * 6 + piece_type]
+    target = 1 << to_square
+    if target & position.occupancy[side]:
+        return 0
+
+    match piece_type:
+        case 0:  # pawn
+            # a pawn can only capture onto a square with an enemy piece or the en passant square, and only
+            # push onto any other
+            if target & position.occupancy[1 - side] or to_square == position.en_passant:
+                return PAWN_ATTACKS[1 - side][to_square] & pieces
+            backward = SOUTH if side == WHITE else NORTH
+            one = shift(target, backward)
+            if one & pieces:
+                return one
+            two = shift(one, backward) & pieces & (RANK_2 if side == WHITE else RANK_7)
+            return two if not one & position.occupancy[2] else 0
+        case 1:  # knight
+            return KNIGHT_ATTACKS[to_square] & pieces
+        case 2:  # bishop
+            return bishop_attacks(to_square, position.occupancy[2]) & pieces
+        case 3:  # rook
+            return rook_attacks(to_square, position.occupancy[2]) & pieces
+        case 4:  # queen
+            occupied = position.occupancy[2]
+            return (rook_attacks(to_square, occupied) | bishop_attacks(to_square, occupied)) & pieces
+        case _:  # king
+            return KING_ATTACKS[to_square] & pieces
+
+
+# whether a move of a piece that can reach its target square leaves the own king safe
+def keeps_king_safe(position: BitBoard, move: int) -> bool:
+    side = position.side
+    position.make_move(move)
+    king = position.pieces[side * 6 + KING]
+    safe = not king or not position.is_attacked(king.bit_length() - 1, 1 - side)
+    position.unmake_move()
+    return safe
+
+
+# the move a SAN string describes in a position, ValueError if it is illegal or ambiguous, with check_legal
+# False a move that is the only one of its piece to reach the square is returned without making sure it
+# leaves the own king safe (play_san does that after playing it)
+def parse_san(position: BitBoard, san: str, check_legal: bool = True) -> int:
+    piece_type, from_mask, to_square, promotion = parse_san_text(san)
+
+    if from_mask < 0:  # castling, checked against the full move generator since it is rare
+        to_square += 56 if position.side == BLACK else 0
+        king = position.pieces[position.side * 6 + KING]
+        if king:
+            move = encode_move(king.bit_length() - 1, to_square)
+            if move in position.legal_moves():
+                return move
+        raise ValueError(f'illegal move {san!r} in {to_fen(position)}')
+
+    if piece_type == PAWN and (to_square < 8 or to_square >= 56) and not promotion:
+        raise ValueError(f'pawn move {san!r} without a promotion piece')
+    promotion = promotion if piece_type == PAWN else 0
+
+    from_squares = candidates(position, piece_type, to_square) & from_mask
+    if not check_legal and from_squares and not from_squares & (from_squares - 1):
+        return encode_move(from_squares.bit_length() - 1, to_square, promotion)
+
+    found = 0
+    for from_square in squares_of(from_squares):
+        move = encode_move(from_square, to_square, promotion)
+        if keeps_king_safe(position, move):
+            if found:
+                raise ValueError(f'ambiguous move {san!r} in {to_fen(position)}')
+            found = move
+    if not found:
+        raise ValueError(f'illegal move {san!r} in {to_fen(position)}')
+    return found
+
+
+# plays the move a SAN string describes and returns it, ValueError (leaving the position as it was) if it
+# is illegal or ambiguous
+def play_san(position: BitBoard, san: str) -> int:
+    side = position.side
+    move = parse_san(position, san, check_legal=False)
+    position.make_move(move)
+    king = position.pieces[side * 6 + KING]
+    if king and position.is_attacked(king.bit_length() - 1, 1 - side):
+        position.unmake_move()
+        raise ValueError(f'illegal move {san!r} in {to_fen(position)}')
+    return move
+
+
+# SAN of a legal move in a position, with + or # if it gives check or mate
+def move_san(position: BitBoard, move: int) -> str:
+    from_square, to_square, promotion = move & 63, move >> 6 & 63, move >> 12
+    piece_type = position.mailbox[from_square] % 6
+    file_names = 'abcdefgh'
+
+    if piece_type == KING and abs(to_square - from_square) == 2:
+        san = 'O-O' if to_square > from_square else 'O-O-O'
+    else:
+        capture = position.mailbox[to_square] != EMPTY or \
+            (piece_type == PAWN and to_square == position.en_passant)
+        san = SAN_LETTERS[piece_type]
+
+        if piece_type == PAWN:
+            if capture:
+                san = file_names[from_square % 8]
+        else:
+            # other pieces of the same type that can legally go to the same square
+            others = [square for square in squares_of(candidates(position, piece_type, to_square))
+                      if square != from_square and keeps_king_safe(position, encode_move(square, to_square))]
+            if others:
+                if all(square % 8 != from_square % 8 for square in others):
+                    san += file_names[from_square % 8]
+                elif all(square // 8 != from_square // 8 for square in others):
+                    san += str(from_square // 8 + 1)
+                else:
+                    san += file_names[from_square % 8] + str(from_square // 8 + 1)
+
+        if capture:
+            san += 'x'
+        san += file_names[to_square % 8] + str(to_square // 8 + 1)
+        if promotion:
+            san += '=' + SAN_LETTERS[promotion]
+
+    position.make_move(move)
+    if position.in_check():
+        san += '#' if not position.legal_moves() else '+'
+    position.unmake_move()
+    return san
+
+
+def escape_tag(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def parse_tag(line: str) -> tuple | None:
+    match = TAG_PATTERN.match(line)
+    if match is None:
+        return None
+    return match.group(1), match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+
+
+# SAN moves of the main line of a game's movetext, without comments, variations, NAGs and the result
+def movetext_moves(movetext: str) -> list[str]:
+    moves: list[str] = list()
+    depth = 0
+    for token in TOKEN_PATTERN.findall(movetext):
+        first = token[0]
+        if first == '(':
+            depth += 1
+        elif first == ')':
+            depth -= 1
+        elif depth or first in '{;$' or first.isdigit() and (token[-1] == '.' or token in RESULTS):
+            continue
+        elif token != '*':
+            moves.append(token)
+    return moves
+
+
+# yields (tags, SAN moves) of every game in an iterable of lines, keeping only one game in memory
+def read_games(lines):
+    tags: dict[str:str] = dict()
+    movetext: list[str] = list()
+    in_comment = False
+    for line in lines:
+        if not in_comment:
+            stripped = line.strip()
+            if stripped.startswith('['):
+                if movetext:
+                    yield tags, movetext_moves(''.join(movetext))
+                    tags, movetext = dict(), list()
+                tag = parse_tag(stripped)
+                if tag is not None:
+                    tags[tag[0]] = tag[1]
+                continue
+            if not stripped or stripped[0] == '%':
+                continue
+        movetext.append(line)
+        # a comment in braces may go on over several lines, tag-like lines inside it are movetext
+        if '{' in line or '}' in line:
+            in_comment = line.rfind('{') > line.rfind('}')
+    if tags or movetext:
+        yield tags, movetext_moves(''.join(movetext))
+
+
+# starting position of a game, taken from its FEN tag if it has one
+def start_position(tags: dict) -> BitBoard:
+    return parse_fen(tags['FEN']) if 'FEN' in tags else BitBoard.starting_position()
+
+
+# yields (position, move) for every move of a game, position being the one the move leads to, it is one
+# BitBoard updated in place for the whole game, so it must be copied to be kept
+def replay(tags: dict, moves: list[str]):
+    position = start_position(tags)
+    for san in moves:
+        yield position, play_san(position, san)
+
+
+# yields (tags, moves encoded with encode_move) of every game in an iterable of lines
+def replay_games(lines):
+    for tags, moves in read_games(lines):
+        yield tags, [move for _, move in replay(tags, moves)]
+
+
+# PGN text of a game given as encoded moves played from start (the starting position if None)
+def game_pgn(moves: list[int], tags: dict | None = None, start: BitBoard | None = None,
+             fullmove_number: int = 1) -> str:
+    position = start.copy() if start is not None else BitBoard.starting_position()
+    tags = dict(tags) if tags is not None else dict()
+    result = tags.get('Result', '*')
+
+    ordered = {name: tags.pop(name, '?' if name != 'Result' else result) for name in SEVEN_TAG_ROSTER}
+    fen = to_fen(position, fullmove_number)
+    if fen != STARTING_FEN:
+        ordered['SetUp'] = '1'
+        ordered['FEN'] = fen
+    ordered.update(tags)
+    lines = [f'[{name} "{escape_tag(str(value))}"]' for name, value in ordered.items()]
+    lines.append('')
+
+    # movetext wrapped to lines of at most 80 characters
+    tokens: list[str] = list()
+    number = fullmove_number
+    for ply, move in enumerate(moves):
+        if position.side == WHITE:
+            tokens.append(f'{number}.')
+        elif not ply:
+            tokens.append(f'{number}...')
+        tokens.append(move_san(position, move))
+        if position.side == BLACK:
+            number += 1
+        position.make_move(move)
+    tokens.append(result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def write_game(file, moves: list[int], tags: dict | None = None, start: BitBoard | None = None,
+               fullmove_number: int = 1):
+    file.write(game_pgn(moves, tags, start, fullmove_number))
+    file.write('\n')
+
+
+def main(arguments: list[str] | None = None) -> int:
+    arguments = sys.argv[1:] if arguments is None else arguments
+    if not arguments:
+        print('usage: python -m src.pgn FILE')
+        return 2
+
+    start = time.perf_counter()
+    games = plies = errors = 0
+    with open(arguments[0], encoding='utf-8', errors='replace') as file:
+        for tags, moves in read_games(file):
+            games += 1
+            try:
+                for _ in replay(tags, moves):
+                    plies += 1
+            except ValueError as error:
+                errors += 1
+                print(f'game {games}: {error}', file=sys.stderr)
+    seconds = time.perf_counter() - start
+    print(f'{games} games ({plies} plies, {errors} with errors) in {seconds:.3f}s, '
+          f'{games / seconds if seconds else 0:.0f} games per second, '
+          f'{plies / seconds if seconds else 0:.0f} plies per second')
+    return 0 if not errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,34 @@
-from pygame import Vector2
+from src.bitboard import COLOR_NAMES, PIECE_NAMES, location_of
 
 
-# chess king
+# chess piece, type and color are kept as one small int: the piece index of bitboard.piece_index
+# (color * 6 + piece type), the square is an int from 0 (a1) to 63 (h8)
 class Piece:
-    def __init__(self, location: Vector2, piece_type: str, color: str):
-        self.location: Vector2 = location
-        self.type: str = piece_type
-        self.color: str = color
-        self.has_moved: bool = False
+    __slots__ = ('square', 'code')
+
+    def __init__(self, square: int, code: int):
+        self.square: int = square
+        self.code: int = code
+
+    # PAWN ... KING of bitboard.py
+    @property
+    def type(self) -> int:
+        return self.code % 6
+
+    # WHITE or BLACK of bitboard.py
+    @property
+    def color(self) -> int:
+        return self.code // 6
+
+    # tile (x, y) on the screen
+    @property
+    def location(self) -> tuple:
+        return location_of(self.square)
+
+    # e.g. 'knight_white', as used for the piece images
+    @property
+    def name(self) -> str:
+        return f'{PIECE_NAMES[self.code % 6]}_{COLOR_NAMES[self.code // 6]}'
+
+    def __repr__(self) -> str:
+        return f'Piece({self.square}, {self.code})'
@@ -0,0 +1,138 @@
+# per-frame timing of the pygame front-end, split into the drawing, input and display steps, with counters for
+# highlight lookups and the moves generated per piece type
+#
+# nothing is measured while profiling is off: the timed methods are only wrapped on the board and screen
+# instances once a Profiler is attached, so the disabled cost is one None check per frame
+#
+# run with: python main.py --profile [TRACE.csv|TRACE.json], F3 shows or hides the overlay
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+from src.bitboard import PIECE_NAMES, move_from
+from utils.constants import *
+
+# methods of Board that are timed, calls of a method inside another one count for both
+BOARD_SECTIONS = ('draw_board', 'draw_focused_piece', 'draw_chess_pieces', 'draw_lines', 'render_dirty',
+                  'possible_places', 'update_engine')
+
+# methods of Screen that are timed
+SCREEN_SECTIONS = ('mouse_input', 'flip')
+
+SECTIONS = BOARD_SECTIONS + SCREEN_SECTIONS
+
+
+class Profiler:
+    def __init__(self, history: int = PROFILE_HISTORY, overlay: bool = True):
+        # one record per frame: frame number, frame time, time and calls of every section and move counters
+        self.frames: deque[dict] = deque(maxlen=history)
+        self.frame_number: int = 0
+        self.frame_start: float = time.perf_counter()
+
+        # totals of the frame that is running
+        self.times: dict[str:float] = dict.fromkeys(SECTIONS, 0.0)
+        self.calls: dict[str:int] = dict.fromkeys(SECTIONS, 0)
+        self.moves: dict[str:int] = dict.fromkeys(PIECE_NAMES, 0)
+
+        self.overlay: bool = overlay
+        self.font: pygame.font.Font | None = None
+
+    # replaces the named methods of an instance by timed ones
+    def instrument(self, instance, names: tuple):
+        for name in names:
+            setattr(instance, name, self.timed(name, getattr(instance, name)))
+
+    def timed(self, name: str, function):
+        times, calls = self.times, self.calls
+        clock = time.perf_counter
+
+        def wrapper(*arguments, **keywords):
+            start = clock()
+            try:
+                return function(*arguments, **keywords)
+            finally:
+                times[name] += clock() - start
+                calls[name] += 1
+
+        return wrapper
+
+    # times the board and screen steps and counts the legal moves generated for the game, per piece type
+    def attach(self, screen):
+        self.instrument(screen, SCREEN_SECTIONS)
+        self.instrument(screen.board, BOARD_SECTIONS)
+
+        game = screen.board.game
+        build_move_cache = game.build_move_cache
+
+        def counted_build_move_cache():
+            build_move_cache()
+            mailbox = game.position.mailbox
+            for move in game.cached_moves:
+                self.moves[PIECE_NAMES[mailbox[move_from(move)] % 6]] += 1
+
+        game.build_move_cache = counted_build_move_cache
+
+    # closes the running frame and starts the next one
+    def end_frame(self):
+        now = time.perf_counter()
+        record = {'frame': self.frame_number, 'frame_ms': (now - self.frame_start) * 1000}
+        for name in SECTIONS:
+            record[f'{name}_ms'] = self.times[name] * 1000
+            record[f'{name}_calls'] = self.calls[name]
+            self.times[name] = 0.0
+            self.calls[name] = 0
+        for name in PIECE_NAMES:
+            record[f'moves_{name}'] = self.moves[name]
+            self.moves[name] = 0
+        self.frames.append(record)
+
+        self.frame_number += 1
+        self.frame_start = now
+
+    # mean and maximum of every column over the last frames
+    def summary(self, frames: int | None = None) -> dict[str:tuple]:
+        records = list(self.frames)[-frames:] if frames else list(self.frames)
+        if not records:
+            return dict()
+        return {name: (sum(record[name] for record in records) / len(records), max(record[name] for record in records))
+                for name in records[0] if name != 'frame'}
+
+    # draws the mean section times and the counts of the last frames into the strip above the board, returns the
+    # area that changed
+    def draw_overlay(self, screen: pygame.Surface, height: float) -> pygame.Rect:
+        if self.font is None:
+            self.font = pygame.font.Font(None, PROFILE_FONT_SIZE)
+        area = pygame.Rect(0, 0, screen.get_width(), int(height))
+        screen.fill(DARK_TILE_COLOR, area)
+
+        summary = self.summary(PROFILE_OVERLAY_FRAMES)
+        if summary:
+            mean, peak = summary['frame_ms']
+            sections = sorted(SECTIONS, key=lambda name: -summary[f'{name}_ms'][0])[:4]
+            frames = min(len(self.frames), PROFILE_OVERLAY_FRAMES)
+            moves = ' '.join(f'{name} {summary[f"moves_{name}"][0] * frames:.0f}' for name in PIECE_NAMES)
+            lines = (f'frame {mean:.2f} ms, max {peak:.2f} ms over {frames} frames, '
+                     f'possible_places calls {summary["possible_places_calls"][0] * frames:.0f}',
+                     ', '.join(f'{name} {summary[f"{name}_ms"][0]:.2f} ms' for name in sections),
+                     f'moves generated: {moves}')
+            for row, line in enumerate(lines):
+                screen.blit(self.font.render(line, True, COLOR_WHITE), (4, 4 + row * PROFILE_FONT_SIZE))
+        return area
+
+    # writes every kept frame record as CSV or, for a .json path, as JSON with a summary
+    def dump(self, path: str):
+        records = list(self.frames)
+        if path.endswith('.json'):
+            summary = {name: {'mean': mean, 'max': peak} for name, (mean, peak) in self.summary().items()}
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump({'summary': summary, 'frames': records}, file)
+            return
+
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            if records:
+                writer = csv.DictWriter(file, fieldnames=list(records[0]))
+                writer.writeheader()
+                writer.writerows(records)
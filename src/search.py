@@ -0,0 +1,338 @@
+# negamax alpha-beta search with iterative deepening, quiescence search and a transposition table,
+# SearchWorker runs it in a separate process so the window keeps responding while the engine thinks
+import multiprocessing
+import queue
+import time
+
+from src.bitboard import *
+from src.tablebase import LOSS, WIN, Tablebase
+from src.transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+from utils.rules import PIECE_VALUES
+
+MATE_SCORE = 30000
+INFINITY = 32000
+MAX_PLY = 128
+
+# centipawn value of every piece type, kings are not counted since both sides always have one
+MATERIAL = [PIECE_VALUES[name] * 100 if name != 'king' else 0 for name in PIECE_NAMES]
+
+# how often (in nodes) the time, node and stop limits are checked
+CHECK_INTERVAL = 1024
+
+
+class SearchAborted(Exception):
+    pass
+
+
+# material balance in centipawns from the point of view of the side to move
+def evaluate(position: BitBoard) -> int:
+    score = 0
+    pieces = position.pieces
+    for piece_type in range(5):
+        score += MATERIAL[piece_type] * (pieces[piece_type].bit_count() - pieces[6 + piece_type].bit_count())
+    return score if position.side == WHITE else -score
+
+
+def is_capture(position: BitBoard, move: int) -> bool:
+    to_square = move >> 6 & 63
+    return position.mailbox[to_square] != EMPTY or \
+        (to_square == position.en_passant and position.mailbox[move & 63] % 6 == PAWN)
+
+
+# mate scores are stored relative to the position instead of the root, so they stay right in other lines
+def score_to_table(score: int, ply: int) -> int:
+    if score > MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score < -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    if score > MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score < -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class Search:
+    def __init__(self, table: TranspositionTable | None = None, stop_event=None, tablebase: Tablebase | None = None):
+        self.table: TranspositionTable = table if table is not None else TranspositionTable()
+
+        # exact results for endgames with few pieces, looked up instead of searched
+        self.tablebase: Tablebase | None = tablebase
+
+        # anything with an is_set method, e.g. threading.Event or multiprocessing.Event
+        self.stop_event = stop_event
+
+        self.position: BitBoard = BitBoard()
+        self.nodes: int = 0
+        self.start_time: float = 0
+        self.deadline: float | None = None
+        self.node_limit: int | None = None
+
+    def check_limits(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchAborted
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted
+
+    # searches the position with increasing depth until a limit is hit, calling on_info after every
+    # completed depth, returns the result of the deepest completed depth
+    def search(self, position: BitBoard, max_depth: int = MAX_PLY, time_limit: float | None = None,
+               node_limit: int | None = None, on_info=None, start_depth: int = 1) -> dict:
+        self.position = position
+        self.nodes = 0
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.table.new_search()
+
+        root_history = len(position.history)
+        moves = position.legal_moves()
+        result = {'best_move': moves[0] if moves else 0, 'score': 0, 'depth': 0, 'nodes': 0, 'time': 0.0,
+                  'nps': 0, 'pv': moves[:1]}
+        if len(moves) <= 1:
+            return result
+
+        for depth in range(min(start_depth, max_depth), max_depth + 1):
+            try:
+                score = self.negamax(depth, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                # unwind the moves the aborted search left on the board
+                while len(position.history) > root_history:
+                    position.unmake_move()
+                break
+
+            pv = self.principal_variation(depth)
+            elapsed = time.perf_counter() - self.start_time
+            result = {'best_move': pv[0] if pv else result['best_move'], 'score': score, 'depth': depth,
+                      'nodes': self.nodes, 'time': round(elapsed, 4),
+                      'nps': round(self.nodes / elapsed) if elapsed > 0 else 0, 'pv': pv}
+            if on_info is not None:
+                on_info(result)
+
+            # a forced mate has been found, searching deeper won't change the move
+            if abs(score) > MATE_SCORE - MAX_PLY:
+                break
+            # the next depth takes several times longer than this one, so it would not finish in time
+            if self.deadline is not None and time.perf_counter() + elapsed * 2 > self.deadline:
+                break
+
+        result['nodes'] = self.nodes
+        return result
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if not self.nodes % CHECK_INTERVAL:
+            self.check_limits()
+
+        position = self.position
+        original_alpha = alpha
+
+        # a position seen before in the game or the line searched is scored as a draw, the side that could
+        # avoid the repetition is assumed to do so if it is better for it
+        if ply and (position.key in position.repetitions or position.halfmove_clock >= 100):
+            return 0
+
+        table_move = 0
+        entry = self.table.probe(position.key)
+        if entry is not None:
+            table_move, table_score, table_depth, flag = entry
+            if ply and table_depth >= depth:
+                table_score = score_from_table(table_score, ply)
+                if flag == EXACT:
+                    return table_score
+                if flag == LOWER_BOUND:
+                    alpha = max(alpha, table_score)
+                elif flag == UPPER_BOUND:
+                    beta = min(beta, table_score)
+                if alpha >= beta:
+                    return table_score
+
+        if ply and self.tablebase is not None and position.occupancy[2].bit_count() <= self.tablebase.max_pieces:
+            result = self.tablebase.probe(position)
+            if result is not None:
+                wdl, plies = result
+                if wdl == WIN:
+                    return MATE_SCORE - ply - plies
+                return -MATE_SCORE + ply + plies if wdl == LOSS else 0
+
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if position.in_check() else 0
+        if ply and position.insufficient_material():
+            return 0
+
+        best_score = -INFINITY
+        best_move = 0
+        for move in self.order_moves(moves, table_move):
+            position.make_move(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(position.key, best_move, score_to_table(best_score, ply), depth, flag)
+        return best_score
+
+    # only looks at captures until the position is quiet, so the evaluation is not taken mid-exchange
+    def quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if not self.nodes % CHECK_INTERVAL:
+            self.check_limits()
+
+        position = self.position
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        captures = [move for move in position.legal_moves() if is_capture(position, move) or move >> 12]
+        for move in self.order_moves(captures, 0):
+            position.make_move(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    # table move first, then captures of the most valuable piece by the least valuable attacker
+    def order_moves(self, moves: list[int], table_move: int) -> list[int]:
+        mailbox = self.position.mailbox
+
+        def priority(move: int) -> int:
+            if move == table_move:
+                return -100000
+            captured = mailbox[move >> 6 & 63]
+            if captured != EMPTY:
+                return -10 * MATERIAL[captured % 6] + MATERIAL[mailbox[move & 63] % 6] // 100 - 1000
+            return -MATERIAL[move >> 12] if move >> 12 else 0
+
+        return sorted(moves, key=priority)
+
+    # best line found so far, followed through the transposition table
+    def principal_variation(self, depth: int) -> list[int]:
+        position = self.position
+        pv: list[int] = list()
+        for _ in range(depth):
+            entry = self.table.probe(position.key)
+            if entry is None or entry[0] not in position.legal_moves():
+                break
+            pv.append(entry[0])
+            position.make_move(entry[0])
+        for _ in pv:
+            position.unmake_move()
+        return pv
+
+
+# stop signal of one request of a SearchWorker: set as soon as the parent has moved on to another request, so
+# a search is stopped by starting the next one without anything having to be cleared in between
+class RequestStopped:
+    def __init__(self, current_request, request_id: int):
+        self.current_request = current_request
+        self.request_id: int = request_id
+
+    def is_set(self) -> bool:
+        return self.current_request.value != self.request_id
+
+
+def worker_main(requests, results, current_request, hash_mb: float, tablebase_directory: str | None):
+    tablebase = Tablebase(tablebase_directory) if tablebase_directory is not None else None
+    search = Search(TranspositionTable(hash_mb), None, tablebase)
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+
+        request_id, position, limits = request
+        if current_request.value != request_id:
+            continue  # stopped or replaced before it was picked up
+
+        def send_info(info: dict):
+            results.put({'type': 'info', 'id': request_id, **info})
+
+        search.stop_event = RequestStopped(current_request, request_id)
+        result = search.search(position, on_info=send_info, **limits)
+        results.put({'type': 'bestmove', 'id': request_id, **result})
+
+
+# runs searches in a background process and streams their progress back
+class SearchWorker:
+    def __init__(self, hash_mb: float = 16, tablebase_directory: str | None = None):
+        self.hash_mb: float = hash_mb
+        self.tablebase_directory: str | None = tablebase_directory
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process: multiprocessing.Process | None = None
+
+        # id of the search whose results are wanted, shared with the worker, which stops a search as soon as
+        # it changes, results of stopped searches are dropped
+        self.request_id: int = 0
+        self.current_request = multiprocessing.Value('q', 0, lock=False)
+        self.thinking: bool = False
+
+    # starts searching a copy of the position, limits are passed on to Search.search, a search that is still
+    # running is stopped
+    def start(self, position: BitBoard, max_depth: int = MAX_PLY, time_limit: float | None = None,
+              node_limit: int | None = None):
+        if self.process is None:
+            self.process = multiprocessing.Process(target=worker_main, daemon=True,
+                                                   args=(self.requests, self.results, self.current_request,
+                                                         self.hash_mb, self.tablebase_directory))
+            self.process.start()
+
+        position = position.copy()
+        position.trim_history()  # only the moves that can still be repeated are needed
+        self.request_id += 1
+        self.current_request.value = self.request_id
+        self.thinking = True
+        self.requests.put((self.request_id, position,
+                           {'max_depth': max_depth, 'time_limit': time_limit, 'node_limit': node_limit}))
+
+    # asks the current search to finish, its result is ignored
+    def stop(self):
+        self.request_id += 1
+        self.current_request.value = self.request_id
+        self.thinking = False
+
+    # messages of the current search that arrived since the last call, never blocks
+    def poll(self) -> list[dict]:
+        messages: list[dict] = list()
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                return messages
+            if message['id'] != self.request_id:
+                continue
+            if message['type'] == 'bestmove':
+                self.thinking = False
+            messages.append(message)
+
+    def close(self):
+        if self.process is not None:
+            self.stop()
+            self.requests.put(None)
+            self.process.join(timeout=1)
+            self.process = None
@@ -0,0 +1,346 @@
+# asyncio server hosting many games at once in one process, spoken to over TCP with one JSON object per line
+# in both directions, and a load generator that plays random games against it
+#
+# requests: {"op": "new", "fen": FEN (optional)}, {"op": "state", "game": ID}, {"op": "move", "game": ID,
+# "move": "e2e4"}, {"op": "undo", "game": ID}, {"op": "close", "game": ID} and {"op": "stats"}, with
+# "legal": true the legal moves of the position are added to the reply, an "id" is copied into the reply
+# replies: {"ok": true, "game": ID, "fen": FEN, "status": "ongoing", "turn": "white", ...} or
+# {"ok": false, "error": MESSAGE}
+#
+# a connection is served one request at a time and its next line is only read once the reply has been
+# written out, so clients that send faster than they read are slowed down by TCP instead of filling memory,
+# games that were not used for idle_timeout seconds are dropped, or with a journal directory closed and
+# resumed from their journal on the next request, close ends a game for good and deletes its journal
+#
+# run with: python -m src.server serve [--port PORT] [--journal-directory DIR]
+# measure with: python -m src.server load [--clients N] [--duration SECONDS] [--spawn]
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+from src.bitboard import move_name
+from src.game_state import GameState
+from src.journal import open_game
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_GAMES = 100000
+IDLE_TIMEOUT = 600  # seconds
+EVICTION_INTERVAL = 10  # seconds between looking for idle games
+MAX_LINE = 1 << 16  # bytes of one request
+WRITE_BUFFER = 1 << 16  # bytes of unsent replies before a connection stops reading requests
+LOAD_MAX_PLIES = 300  # plies after which the load generator gives up a game and starts a new one
+
+
+# a game with the lock that orders the requests of several connections to it
+class HostedGame:
+    def __init__(self, game: GameState):
+        self.game: GameState = game
+        self.lock: asyncio.Lock = asyncio.Lock()
+        self.last_used: float = time.monotonic()
+
+
+class GameServer:
+    def __init__(self, max_games: int = MAX_GAMES, idle_timeout: float = IDLE_TIMEOUT,
+                 journal_directory: str | None = None):
+        self.games: dict[str:HostedGame] = dict()
+        self.resuming: dict[str:asyncio.Task] = dict()  # games being read from their journal
+        self.max_games: int = max_games
+        self.idle_timeout: float = idle_timeout
+        self.journal_directory: str | None = journal_directory
+        if journal_directory is not None:
+            os.makedirs(journal_directory, exist_ok=True)
+
+        self.connections: int = 0
+        self.moves_played: int = 0
+        self.evicted: int = 0
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+        eviction = asyncio.create_task(self.evict_idle_games())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            eviction.cancel()
+            self.close()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # longer than MAX_LINE, the rest of the stream can't be trusted
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                writer.write(json.dumps(await self.handle_line(line)).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def handle_line(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'invalid JSON'}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'a request must be a JSON object'}
+
+        try:
+            reply = await self.handle_request(request)
+        except KeyError as error:
+            reply = {'ok': False, 'error': f'missing field {error}'}
+        except (TypeError, ValueError, IndexError) as error:
+            reply = {'ok': False, 'error': str(error) or type(error).__name__}
+        except Exception as error:  # a bad request must not take the connection down
+            reply = {'ok': False, 'error': f'{type(error).__name__}: {error}'}
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    async def handle_request(self, request: dict) -> dict:
+        operation = request.get('op')
+        if operation == 'stats':
+            return {'ok': True, 'games': len(self.games), 'connections': self.connections,
+                    'moves': self.moves_played, 'evicted': self.evicted}
+        if operation == 'new':
+            return await self.new_game(request)
+        if operation not in ('state', 'move', 'undo', 'close'):
+            return {'ok': False, 'error': f'unknown op {operation}'}
+
+        game_id = str(request['game'])
+        while True:
+            hosted = await self.find_game(game_id)
+            if hosted is None:
+                return {'ok': False, 'error': f'no game {game_id}'}
+            async with hosted.lock:
+                if self.games.get(game_id) is not hosted:
+                    continue  # evicted or closed while this request waited for the lock
+                hosted.last_used = time.monotonic()
+                # with a journal a move waits for the disk, which must not stop the other games, the server's
+                # own counters and games are only changed here on the event loop
+                if hosted.game.journal is not None and operation != 'state':
+                    reply = await asyncio.to_thread(self.apply, game_id, hosted, request)
+                else:
+                    reply = self.apply(game_id, hosted, request)
+                if reply['ok'] and operation == 'move':
+                    self.moves_played += 1
+                elif operation == 'close':
+                    del self.games[game_id]
+                return reply
+
+    async def new_game(self, request: dict) -> dict:
+        fen = request.get('fen')
+        if fen is not None and not isinstance(fen, str):
+            raise TypeError('fen must be a string')
+        if len(self.games) >= self.max_games:
+            return {'ok': False, 'error': 'server full'}
+
+        game_id = uuid.uuid4().hex
+        if self.journal_directory is not None:
+            game = await asyncio.to_thread(open_game, self.journal_path(game_id), fen)
+        else:
+            game = GameState.from_fen(fen) if fen else GameState()
+        hosted = self.games[game_id] = HostedGame(game)
+        return self.state(game_id, hosted, request)
+
+    # the game with an id, resumed from its journal if it was evicted
+    async def find_game(self, game_id: str) -> HostedGame | None:
+        hosted = self.games.get(game_id)
+        if hosted is not None or self.journal_directory is None or not game_id.isalnum():
+            return hosted
+        # requests for a game that is being resumed wait for it, a second copy opened from the same journal would
+        # cut off the moves the first one appends when it trims the journal
+        if game_id not in self.resuming:
+            if len(self.games) >= self.max_games:
+                return None
+            self.resuming[game_id] = asyncio.create_task(self.resume_game(game_id))
+        return await asyncio.shield(self.resuming[game_id])
+
+    async def resume_game(self, game_id: str) -> HostedGame | None:
+        try:
+            game = await asyncio.to_thread(self.load_game, self.journal_path(game_id))
+        finally:
+            del self.resuming[game_id]
+        if game is None:
+            return None
+        hosted = self.games[game_id] = HostedGame(game)
+        return hosted
+
+    # the game of a journal, None if there is no journal, called outside of the event loop
+    @staticmethod
+    def load_game(path: str) -> GameState | None:
+        return open_game(path) if os.path.exists(path) else None
+
+    def journal_path(self, game_id: str) -> str:
+        return os.path.join(self.journal_directory, f'{game_id}.journal')
+
+    # carries out a request on a game, called while holding its lock and, for a journaled game, in a worker
+    # thread, so it only changes the game
+    def apply(self, game_id: str, hosted: HostedGame, request: dict) -> dict:
+        game = hosted.game
+        match request['op']:
+            case 'move':
+                start = time.perf_counter()
+                name = request['move']
+                if not isinstance(name, str):
+                    raise TypeError('move must be a string')
+                move = next((move for move in game.moves() if move_name(move) == name), None)
+                if move is None:
+                    return {'ok': False, 'error': f'illegal move {name}', 'game': game_id}
+                game.make_move(move)
+                reply = self.state(game_id, hosted, request)
+                reply['validation_us'] = round((time.perf_counter() - start) * 1e6)
+                return reply
+            case 'undo':
+                if not game.undo():
+                    return {'ok': False, 'error': 'no move to take back', 'game': game_id}
+            case 'close':
+                if game.journal is not None:
+                    game.journal.delete()
+                return {'ok': True, 'game': game_id}
+        return self.state(game_id, hosted, request)
+
+    @staticmethod
+    def state(game_id: str, hosted: HostedGame, request: dict) -> dict:
+        game = hosted.game
+        reply = {'ok': True, 'game': game_id, 'fen': game.fen(), 'status': game.status(), 'turn': game.player_turn}
+        if request.get('legal'):
+            reply['legal'] = [move_name(move) for move in game.moves()]
+        return reply
+
+    async def evict_idle_games(self):
+        while True:
+            await asyncio.sleep(EVICTION_INTERVAL)
+            deadline = time.monotonic() - self.idle_timeout
+            for game_id, hosted in list(self.games.items()):
+                if hosted.last_used >= deadline or hosted.lock.locked():
+                    continue
+                # the game is dropped only once its journal is closed, requests that waited for the lock find it
+                # gone and resume it from the closed journal
+                async with hosted.lock:
+                    if self.games.get(game_id) is not hosted or hosted.last_used >= deadline:
+                        continue
+                    if hosted.game.journal is not None:
+                        await asyncio.to_thread(hosted.game.journal.close)
+                    del self.games[game_id]
+                    self.evicted += 1
+
+    def close(self):
+        for hosted in self.games.values():
+            if hosted.game.journal is not None:
+                hosted.game.journal.close()
+
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: dict) -> dict:
+    writer.write(json.dumps(request).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+# plays random games on one connection until the deadline, appending the round trip and validation time of
+# every move to latencies
+async def load_client(host: str, port: int, deadline: float, latencies: list, validations: list, seed: int):
+    generator = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    try:
+        while time.monotonic() < deadline:
+            reply = await send(reader, writer, {'op': 'new', 'legal': True})
+            if not reply['ok']:
+                raise RuntimeError(reply['error'])
+            game_id = reply['game']
+            for _ in range(LOAD_MAX_PLIES):
+                if reply['status'] != 'ongoing' or time.monotonic() > deadline:
+                    break
+                start = time.perf_counter()
+                reply = await send(reader, writer, {'op': 'move', 'game': game_id,
+                                                    'move': generator.choice(reply['legal']), 'legal': True})
+                latencies.append(time.perf_counter() - start)
+                validations.append(reply['validation_us'])
+            await send(reader, writer, {'op': 'close', 'game': game_id})
+    finally:
+        writer.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+async def run_load(host: str, port: int, clients: int, duration: float) -> dict:
+    latencies: list[float] = list()
+    validations: list[int] = list()
+    start = time.monotonic()
+    await asyncio.gather(*(load_client(host, port, start + duration, latencies, validations, seed)
+                           for seed in range(clients)))
+    elapsed = time.monotonic() - start
+    return {'clients': clients, 'moves': len(latencies), 'moves_per_second': len(latencies) / elapsed,
+            'round_trip_p50_ms': percentile(latencies, 0.5) * 1000,
+            'round_trip_p99_ms': percentile(latencies, 0.99) * 1000,
+            'validation_p50_us': percentile(validations, 0.5), 'validation_p99_us': percentile(validations, 0.99)}
+
+
+# starts a server process and waits until it accepts connections
+def spawn_server(host: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, '-m', 'src.server', 'serve', '--host', host, '--port', str(port)])
+    for _ in range(100):
+        try:
+            socket.create_connection((host, port)).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError('server did not start')
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Host many games over TCP, or put load on such a server.')
+    parser.add_argument('command', choices=('serve', 'load'))
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-games', type=int, default=MAX_GAMES)
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT, help='seconds before a game is dropped')
+    parser.add_argument('--journal-directory', help='save every game there, evicted games are resumed from it')
+    parser.add_argument('--clients', type=int, default=200, help='connections of the load generator')
+    parser.add_argument('--duration', type=float, default=10, help='seconds the load generator runs')
+    parser.add_argument('--spawn', action='store_true', help='start a server process to put load on')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.command == 'serve':
+        server = GameServer(arguments.max_games, arguments.idle_timeout, arguments.journal_directory)
+        try:
+            asyncio.run(server.serve(arguments.host, arguments.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    process = spawn_server(arguments.host, arguments.port) if arguments.spawn else None
+    try:
+        result = asyncio.run(run_load(arguments.host, arguments.port, arguments.clients, arguments.duration))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print(f'{result["moves"]} moves by {result["clients"]} clients, {result["moves_per_second"]:.0f} moves/s, '
+          f'round trip p50 {result["round_trip_p50_ms"]:.2f} ms p99 {result["round_trip_p99_ms"]:.2f} ms, '
+          f'validation p50 {result["validation_p50_us"]} us p99 {result["validation_p99_us"]} us')
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
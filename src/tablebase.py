@@ -0,0 +1,463 @@
+# endgame tablebases for positions with few pieces, generated locally by retrograde analysis
+#
+# a table covers one material signature such as KQvK (white pieces, then black pieces, strongest first) and
+# holds one signed 16-bit value for every placement of the pieces and side to move: 0 is a draw, plies + 1
+# if the side to move mates in that many plies and -(plies + 1) if it gets mated, so -1 is checkmate
+#
+# the board is turned so that the white king stands in a fixed part of it before a position is indexed: a
+# position without pawns keeps its value under all 8 rotations and reflections of the board, so the white king
+# is moved into the triangle a1-d1-d4 (and the black king below the a1-h8 diagonal while the white one is on
+# it), a position with pawns only under mirroring the files, so the white king is moved to the files a-d, the
+# index is then side, the pair of king squares (462 pairs without pawns, 1806 with) and the square of every
+# other piece in signature order, positions with the colors the other way around are looked up mirrored
+#
+# tables are built from the move generator of bitboard.py: every position is expanded once into its
+# children, then won and lost positions are found level by level (win in 1, loss in 2, win in 3, ...) with
+# numpy, captures and promotions are resolved with the smaller tables, which are generated first
+#
+# en passant is left out: a table value assumes no en passant capture is possible, so probe returns None (and
+# the search goes on) in positions where one is, and a pawn's double step is generated as if the opponent
+# could not take it en passant
+#
+# generation keeps five arrays of one entry per index and the two indexes of every quiet move of every
+# position in memory, so it is limited to MAX_PIECES pieces: a 4 piece table has 3.8 million indexes without
+# pawns and 14.8 million with them and needs up to a few GB while generating, a 5 piece one would have 242
+# million (947 million with pawns), whose quiet moves alone would take tens of GB
+#
+# generate with: python -m src.tablebase generate KQvK KRvK KPvK [--directory DIR]
+# look up with: python -m src.tablebase probe FEN [--directory DIR]
+import argparse
+import mmap
+import os
+import sys
+import time
+from array import array
+from itertools import product
+
+from src.bitboard import *
+from src.fen import parse_fen
+
+DEFAULT_DIRECTORY = 'data/tablebases'
+MAGIC = b'CTB2'
+HEADER_SIZE = 16  # magic, then the signature padded with zero bytes
+
+# signature letters in the order pieces are listed, strongest first
+SIGNATURE_LETTERS = 'KQRBNP'
+LETTER_TYPES = {'K': KING, 'Q': QUEEN, 'R': ROOK, 'B': BISHOP, 'N': KNIGHT, 'P': PAWN}
+LETTER_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+
+MAX_PIECES = 4  # most pieces of a table that can be generated, kings included
+
+DRAW = 0
+WIN = 1
+LOSS = -1
+
+
+# (white letters, black letters) of a position, e.g. ('KQ', 'K')
+def material(position: BitBoard) -> tuple:
+    sides = list()
+    for color in (WHITE, BLACK):
+        sides.append(''.join(letter * position.pieces[piece_index(color, LETTER_TYPES[letter])].bit_count()
+                             for letter in SIGNATURE_LETTERS))
+    return tuple(sides)
+
+
+def material_strength(letters: str) -> tuple:
+    return sum(LETTER_VALUES[letter] for letter in letters), len(letters), letters
+
+
+# signature of the table covering a material, the stronger side is always listed (and stored) as white,
+# mirrored is true if the position has to be mirrored to be looked up
+def signature_of(white: str, black: str) -> tuple:
+    if material_strength(black) > material_strength(white):
+        return f'{black}v{white}', True
+    return f'{white}v{black}', False
+
+
+# normalizes e.g. 'kqk', 'KQvK' and 'KQ-K' to 'KQvK' with the stronger side first
+def parse_signature(text: str) -> str:
+    text = text.upper().replace('-', 'V')
+    if 'V' in text:
+        white, black = text.split('V')
+    else:
+        second_king = text.index('K', 1)
+        white, black = text[:second_king], text[second_king:]
+    for letters in (white, black):
+        if letters.count('K') != 1 or letters[0] != 'K' or any(letter not in LETTER_TYPES for letter in letters):
+            raise ValueError(f'invalid material signature {text!r}')
+    order = SIGNATURE_LETTERS.index
+    return signature_of(''.join(sorted(white, key=order)), ''.join(sorted(black, key=order)))[0]
+
+
+# (color, piece type) of every piece of a signature, in index order
+def signature_pieces(signature: str) -> list[tuple]:
+    white, black = signature.split('v')
+    return [(WHITE, LETTER_TYPES[letter]) for letter in white] + [(BLACK, LETTER_TYPES[letter]) for letter in black]
+
+
+# signatures a table depends on: every capture and every promotion leads to one of them
+def child_signatures(signature: str) -> set[str]:
+    white, black = signature.split('v')
+    children = set()
+    for side, other, flip in ((white, black, False), (black, white, True)):
+        for index, letter in enumerate(side):
+            if letter == 'K':
+                continue
+            rest = side[:index] + side[index + 1:]
+            replacements = [''] + (['Q', 'R', 'B', 'N'] if letter == 'P' else [])
+            for replacement in replacements:
+                letters = ''.join(sorted(rest + replacement, key=SIGNATURE_LETTERS.index))
+                children.add(parse_signature(f'{other}v{letters}' if flip else f'{letters}v{other}'))
+    children.discard(signature)
+    return {child for child in children if not is_drawn_material(child)}
+
+
+# material that can never be won, such tables are not generated
+def is_drawn_material(signature: str) -> bool:
+    white, black = signature.split('v')
+    return white in ('K', 'KB', 'KN') and black in ('K', 'KB', 'KN') and len(white + black) <= 3
+
+
+def encode_result(wdl: int, plies: int) -> int:
+    return 0 if wdl == DRAW else wdl * (plies + 1)
+
+
+# (WIN / DRAW / LOSS for the side to move, plies to mate) of a stored value
+def decode_result(value: int) -> tuple:
+    if value == 0:
+        return DRAW, 0
+    return (WIN, value - 1) if value > 0 else (LOSS, -value - 1)
+
+
+# a board with the colors swapped and the ranks flipped, the game value stays the same
+def mirrored(position: BitBoard) -> BitBoard:
+    flipped = BitBoard()
+    for square, index in enumerate(position.mailbox):
+        if index != EMPTY:
+            flipped.add_piece(square ^ 56, 1 - index // 6, index % 6)
+    flipped.side = 1 - position.side
+    return flipped
+
+
+# the 8 ways to turn the board, as square maps: bit 0 mirrors the files, bit 1 the ranks, bit 2 swaps files and
+# ranks (after the mirroring)
+def board_transform(transform: int) -> tuple:
+    squares = list()
+    for square in range(64):
+        if transform & 1:
+            square ^= 7
+        if transform & 2:
+            square ^= 56
+        if transform & 4:
+            square = (square & 7) << 3 | square >> 3
+        squares.append(square)
+    return tuple(squares)
+
+
+BOARD_TRANSFORMS = tuple(board_transform(transform) for transform in range(8))
+
+
+# the transform that moves the white king into the triangle a1-d1-d4, and the black king below the diagonal
+# while the white one is on it
+def pawnless_transform(white_king: int, black_king: int) -> tuple:
+    transform = (1 if white_king & 7 > 3 else 0) | (2 if white_king >> 3 > 3 else 0)
+    white_king, black_king = BOARD_TRANSFORMS[transform][white_king], BOARD_TRANSFORMS[transform][black_king]
+    if white_king >> 3 > white_king & 7 or white_king >> 3 == white_king & 7 and black_king >> 3 > black_king & 7:
+        transform |= 4
+    return BOARD_TRANSFORMS[transform]
+
+
+# transforms by white and black king square
+PAWNLESS_TRANSFORMS = tuple(tuple(pawnless_transform(white_king, black_king) for black_king in range(64))
+                            for white_king in range(64))
+PAWN_TRANSFORMS = tuple(BOARD_TRANSFORMS[1 if white_king & 7 > 3 else 0] for white_king in range(64))
+
+
+# (white king, black king) of every legal pair of king squares left after turning the board
+def king_pairs(pawns: bool) -> list[tuple]:
+    pairs = list()
+    for white_king in range(64):
+        if white_king & 7 > 3 or not pawns and (white_king >> 3 > 3 or white_king >> 3 > white_king & 7):
+            continue
+        for black_king in range(64):
+            if black_king == white_king or KING_ATTACKS[white_king] >> black_king & 1:
+                continue
+            if not pawns and white_king >> 3 == white_king & 7 and black_king >> 3 > black_king & 7:
+                continue
+            pairs.append((white_king, black_king))
+    return pairs
+
+
+# how the positions of a signature are laid out in its table
+class TableLayout:
+    def __init__(self, signature: str):
+        self.pieces: list[tuple] = signature_pieces(signature)
+        self.count: int = len(self.pieces)
+        self.black_king: int = self.pieces.index((BLACK, KING))  # slot of the black king, the white one is 0
+        self.others: list[int] = [slot for slot in range(1, self.count) if slot != self.black_king]
+        self.pawns: bool = any(piece_type == PAWN for _, piece_type in self.pieces)
+
+        self.pairs: list[tuple] = king_pairs(self.pawns)
+        self.pair_indexes: dict[tuple:int] = {pair: index for index, pair in enumerate(self.pairs)}
+        self.size: int = 2 * len(self.pairs) * 64 ** len(self.others)
+
+    # index of a legal position given as the squares of its pieces in signature order
+    def index(self, squares: list[int], side: int) -> int:
+        white_king, black_king = squares[0], squares[self.black_king]
+        transform = PAWN_TRANSFORMS[white_king] if self.pawns else PAWNLESS_TRANSFORMS[white_king][black_king]
+        index = side * len(self.pairs) + self.pair_indexes[transform[white_king], transform[black_king]]
+        for slot in self.others:
+            index = index * 64 + transform[squares[slot]]
+        return index
+
+
+# layout of every signature used so far
+LAYOUTS: dict[str:TableLayout] = dict()
+
+
+def table_layout(signature: str) -> TableLayout:
+    layout = LAYOUTS.get(signature)
+    if layout is None:
+        layout = LAYOUTS[signature] = TableLayout(signature)
+    return layout
+
+
+class Tablebase:
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.directory: str = directory
+
+        # signature: (file, mmap, values) of every table opened so far, None if there is no file for it
+        self.tables: dict[str:tuple | None] = dict()
+
+        # most pieces of any table in the directory, positions with more are not looked up
+        self.max_pieces: int = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith('.tb'):
+                    self.max_pieces = max(self.max_pieces, len(name) - len('v.tb'))
+
+    def path(self, signature: str) -> str:
+        return os.path.join(self.directory, f'{signature}.tb')
+
+    def close(self):
+        for signature in list(self.tables):
+            self.close_table(signature)
+
+    def close_table(self, signature: str):
+        table = self.tables.pop(signature, None)
+        if table is not None:
+            file, memory, values = table
+            values.release()
+            memory.close()
+            file.close()
+
+    # the values of a table as a memoryview of signed 16-bit ints, None if it has not been generated
+    def values(self, signature: str) -> memoryview | None:
+        if signature not in self.tables:
+            path = self.path(signature)
+            if not os.path.exists(path):
+                self.tables[signature] = None
+                return None
+            file = open(path, 'rb')
+            memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if memory[:4] != MAGIC or memory[4:HEADER_SIZE].rstrip(b'\0').decode() != signature:
+                memory.close()
+                file.close()
+                raise ValueError(f'{path} is not a tablebase for {signature}')
+            if sys.byteorder != 'little':
+                raise ValueError('tablebase files are little-endian, this machine is not')
+            self.tables[signature] = (file, memory, memoryview(memory)[HEADER_SIZE:].cast('h'))
+        table = self.tables[signature]
+        return table[2] if table is not None else None
+
+    # writes the values (a numpy array) of a table
+    def add(self, signature: str, values):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(signature)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(MAGIC + signature.encode().ljust(HEADER_SIZE - len(MAGIC), b'\0'))
+            file.write(values.astype('<i2').tobytes())
+        self.close_table(signature)
+        os.replace(path + '.tmp', path)
+        self.max_pieces = max(self.max_pieces, len(signature) - 1)
+
+    # (WIN / DRAW / LOSS for the side to move, plies to mate) of a position, None if there is no table for
+    # it, it still has castling rights or a pawn can capture en passant
+    def probe(self, position: BitBoard) -> tuple | None:
+        if position.castling:
+            return None
+        if position.en_passant != EMPTY and PAWN_ATTACKS[1 - position.side][position.en_passant] & \
+                position.pieces[piece_index(position.side, PAWN)]:
+            return None
+        white, black = material(position)
+        signature, mirror = signature_of(white, black)
+        if is_drawn_material(signature):
+            return DRAW, 0
+        values = self.values(signature)
+        if values is None:
+            return None
+        if mirror:
+            position = mirrored(position)
+
+        # pieces of the same kind go in ascending square order, the table holds every order anyway
+        layout = table_layout(signature)
+        squares = list()
+        for color, piece_type in dict.fromkeys(layout.pieces):
+            squares.extend(squares_of(position.pieces[piece_index(color, piece_type)]))
+        return decode_result(values[layout.index(squares, position.side)])
+
+
+# values of every position of a signature, the tables it depends on have to be in the tablebase already
+def generate_table(signature: str, tablebase: Tablebase):
+    # only needed to generate, so that probing (e.g. from the search) doesn't pay for importing numpy
+    import numpy as np
+
+    layout = table_layout(signature)
+    pieces, count, size = layout.pieces, layout.count, layout.size
+
+    # edges from every position to the positions its quiet moves lead to, with the symmetries even a 5 piece
+    # table would have indexes that fit in 32 bits
+    index_type = 'i' if size < 2 ** 31 else 'q'
+    edge_parents = array(index_type)
+    edge_children = array(index_type)
+    children = np.zeros(size, dtype=np.int32)  # internal children still not known to win
+    resolved = np.zeros(size, dtype=bool)
+    values = np.zeros(size, dtype=np.int32)
+    win_at = np.zeros(size, dtype=np.int32)  # ply of the fastest win by a capture or promotion, 0 if none
+    loss_plies = np.zeros(size, dtype=np.int32)  # longest win of the opponent seen among the children
+
+    # every index in order: side, king pair, then the other pieces like the digits of a base 64 number
+    index = -1
+    squares = [0] * count
+    for side, (white_king, black_king), others in product((WHITE, BLACK), layout.pairs,
+                                                          product(range(64), repeat=len(layout.others))):
+        index += 1
+        squares[0], squares[layout.black_king] = white_king, black_king
+        for slot, square in zip(layout.others, others):
+            squares[slot] = square
+
+        if len(set(squares)) < count or any(piece_type == PAWN and (square < 8 or square >= 56)
+                                            for (_, piece_type), square in zip(pieces, squares)):
+            resolved[index] = True
+            continue
+
+        position = BitBoard()
+        for (color, piece_type), square in zip(pieces, squares):
+            position.add_piece(square, color, piece_type)
+        position.side = side
+
+        # the side that just moved can't be in check
+        enemy_king = position.pieces[piece_index(1 - side, KING)]
+        if position.is_attacked(enemy_king.bit_length() - 1, side):
+            resolved[index] = True
+            continue
+
+        moves = position.legal_moves()
+        if not moves:
+            resolved[index] = True
+            values[index] = encode_result(LOSS, 0) if position.in_check() else DRAW
+            continue
+
+        blocked = False  # a capture or promotion leads to a draw, so the position can't be lost
+        for move in moves:
+            from_square, to_square = move & 63, move >> 6 & 63
+            if position.mailbox[to_square] == EMPTY and not move >> 12:
+                child = squares.copy()
+                child[squares.index(from_square)] = to_square
+                edge_parents.append(index)
+                edge_children.append(layout.index(child, 1 - side))
+                children[index] += 1
+                continue
+
+            position.make_move(move)
+            wdl, plies = tablebase.probe(position)
+            position.unmake_move()
+            if wdl == LOSS:
+                win_at[index] = plies + 1 if not win_at[index] else min(win_at[index], plies + 1)
+            elif wdl == WIN:
+                loss_plies[index] = max(loss_plies[index], plies + 1)
+            else:
+                blocked = True
+        if blocked:
+            children[index] += 1
+
+    edge_parents = np.frombuffer(edge_parents, dtype=np.int32 if index_type == 'i' else np.int64)
+    edge_children = np.frombuffer(edge_children, dtype=np.int32 if index_type == 'i' else np.int64)
+
+    # won and lost positions by increasing distance to mate, a position wins at ply p if a child is lost in
+    # p - 1, and is lost once every child is a win for the opponent
+    last = int(win_at.max())
+    ply = 1
+    while True:
+        lost_children = values[edge_children] == encode_result(LOSS, ply - 1)
+        wins = np.zeros(size, dtype=bool)
+        wins[edge_parents[lost_children]] = True
+        wins |= win_at == ply
+        wins &= ~resolved
+        values[wins] = encode_result(WIN, ply)
+        resolved |= wins
+
+        # parents lose a child that could still have saved them
+        won_children = wins[edge_children]
+        children -= np.bincount(edge_parents[won_children], minlength=size).astype(np.int32)
+        np.maximum.at(loss_plies, edge_parents[won_children], ply + 1)
+
+        losses = ~resolved & (children == 0) & (loss_plies > 0)
+        values[losses] = -(loss_plies[losses] + 1)
+        resolved |= losses
+        if losses.any():
+            last = max(last, int(loss_plies[losses].max()) + 1)
+
+        if not wins.any() and not losses.any() and ply > last:
+            break
+        ply += 1
+
+    return values
+
+
+# generates a table and every table it depends on that is not in the tablebase yet
+def generate(signature: str, tablebase: Tablebase, log=None):
+    signature = parse_signature(signature)
+    if len(signature) - 1 > MAX_PIECES:
+        raise ValueError(f'{signature} has more than {MAX_PIECES} pieces, its table can\'t be generated')
+    for child in sorted(child_signatures(signature), key=lambda name: len(name)):
+        if tablebase.values(child) is None:
+            generate(child, tablebase, log)
+
+    start = time.perf_counter()
+    values = generate_table(signature, tablebase)
+    tablebase.add(signature, values)
+    if log is not None:
+        wins, losses = int((values > 0).sum()), int((values < 0).sum())
+        longest = int(abs(values).max()) - 1 if wins or losses else 0
+        log(f'{signature}: {values.size} positions, {wins} won and {losses} lost for the side to move, '
+            f'longest mate {longest} plies, {time.perf_counter() - start:.1f}s')
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Generate and look up endgame tablebases.')
+    parser.add_argument('command', choices=('generate', 'probe'))
+    parser.add_argument('arguments', nargs='+', help='signatures such as KQvK to generate, or a FEN to look up')
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    arguments = parser.parse_args(arguments)
+
+    tablebase = Tablebase(arguments.directory)
+    try:
+        if arguments.command == 'generate':
+            for signature in arguments.arguments:
+                generate(signature, tablebase, print)
+            return 0
+
+        result = tablebase.probe(parse_fen(' '.join(arguments.arguments)))
+        if result is None:
+            print('no table for this position')
+            return 1
+        wdl, plies = result
+        print({WIN: f'win, mate in {plies} plies', LOSS: f'loss, mated in {plies} plies', DRAW: 'draw'}[wdl])
+        return 0
+    finally:
+        tablebase.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
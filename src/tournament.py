@@ -0,0 +1,344 @@
+# plays many games between two engines at once, in a pool of processes, and reports the Elo difference of
+# the first engine with its error bars and a sequential probability ratio test (SPRT) verdict
+#
+# an engine is 'internal' (the search of this project, run in the game's process, options can follow as in
+# 'internal:depth=4,hash=32') or the command line of any UCI engine, e.g. 'python uci.py'
+#
+# every opening is played twice with the colors swapped, every finished game is appended to the JSONL output
+# right away, so a run can be watched or cut short at any time
+#
+# run with: python -m src.tournament --engine internal --engine "python uci.py" --games 200 --concurrency 4
+#           --tc 10+0.1 [--openings FILE] [--output results.jsonl] [--sprt 0 5]
+import argparse
+import json
+import math
+import multiprocessing
+import shlex
+import subprocess
+import sys
+import time
+
+from src.bitboard import *
+from src.fen import STARTING_FEN, parse_fen, to_fen
+from src.pgn import read_games, replay, start_position
+from src.search import Search
+from src.transposition import TranspositionTable
+from src.uci import clock_time_limit
+
+MAX_PLIES = 400  # games still going after this many plies are adjudicated a draw
+
+# game results from white's point of view
+WHITE_WINS = '1-0'
+BLACK_WINS = '0-1'
+DRAWN = '1/2-1/2'
+
+
+class InternalPlayer:
+    def __init__(self, options: dict):
+        self.depth: int | None = int(options['depth']) if 'depth' in options else None
+        self.nodes: int | None = int(options['nodes']) if 'nodes' in options else None
+        self.search = Search(TranspositionTable(float(options.get('hash', 16))))
+
+    def new_game(self):
+        self.search.table.clear()
+
+    # limits holds the UCI go arguments: wtime, btime, winc, binc (milliseconds), movetime, depth or nodes
+    def choose(self, position: BitBoard, start_fen: str, moves: list[int], limits: dict) -> int:
+        time_limit = None
+        if 'movetime' in limits:
+            time_limit = limits['movetime'] / 1000
+        elif 'wtime' in limits:
+            color = 'w' if position.side == WHITE else 'b'
+            time_limit = clock_time_limit(limits[f'{color}time'], limits[f'{color}inc'])
+        depth = limits.get('depth', self.depth)
+        result = self.search.search(position.copy(), max_depth=depth if depth is not None else 128,
+                                    time_limit=time_limit, node_limit=limits.get('nodes', self.nodes))
+        return result['best_move']
+
+    def close(self):
+        pass
+
+
+class UCIPlayer:
+    def __init__(self, command: str):
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.send('uci')
+        self.wait_for('uciok')
+
+    def send(self, line: str):
+        self.process.stdin.write(line + '\n')
+        self.process.stdin.flush()
+
+    # reads output until a line starting with a word, returns that line
+    def wait_for(self, word: str) -> str:
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError(f'engine exited while waiting for {word}')
+            if line.split()[:1] == [word]:
+                return line
+
+    def new_game(self):
+        self.send('ucinewgame')
+        self.send('isready')
+        self.wait_for('readyok')
+
+    def choose(self, position: BitBoard, start_fen: str, moves: list[int], limits: dict) -> int:
+        command = f'position fen {start_fen}'
+        if moves:
+            command += ' moves ' + ' '.join(move_name(move) for move in moves)
+        self.send(command)
+        self.send('go ' + ' '.join(f'{key} {round(value)}' for key, value in limits.items()))
+        best = self.wait_for('bestmove').split()
+        name = best[1] if len(best) > 1 else '0000'
+        return next((move for move in position.legal_moves() if move_name(move) == name), 0)
+
+    def close(self):
+        try:
+            self.send('quit')
+            self.process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+def make_player(spec: str):
+    if spec == 'internal' or spec.startswith('internal:'):
+        options = dict(option.split('=', 1) for option in spec[len('internal:'):].split(',') if '=' in option)
+        return InternalPlayer(options)
+    return UCIPlayer(spec)
+
+
+# (base seconds, increment seconds) of a time control such as '10+0.1' or '60'
+def parse_time_control(text: str) -> tuple:
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+
+# how a position ends the game: (result, reason), or None if the game goes on
+def game_over(position: BitBoard) -> tuple | None:
+    if not position.legal_moves():
+        if position.in_check():
+            return (BLACK_WINS if position.side == WHITE else WHITE_WINS), 'checkmate'
+        return DRAWN, 'stalemate'
+    if position.insufficient_material():
+        return DRAWN, 'insufficient material'
+    claim = position.draw_claim()
+    if claim is not None:
+        return DRAWN, claim.replace('_', ' ')
+    return None
+
+
+# plays one game, run in a worker process, task is (game number, opening FEN, white spec, black spec,
+# settings) and the returned record is one line of the JSONL output
+def play_game(task: tuple) -> dict:
+    number, opening, white_spec, black_spec, settings = task
+    start = time.perf_counter()
+    players = [make_player(white_spec), make_player(black_spec)]
+    position = parse_fen(opening)
+    moves: list[int] = list()
+
+    base, increment = settings.get('tc') or (None, 0)
+    clocks = [base * 1000, base * 1000] if base is not None else None
+    result, reason = None, None
+    try:
+        for player in players:
+            player.new_game()
+
+        while result is None:
+            ended = game_over(position)
+            if ended is not None:
+                result, reason = ended
+                break
+            if len(moves) >= settings.get('max_plies', MAX_PLIES):
+                result, reason = DRAWN, 'adjudicated'
+                break
+
+            side = position.side
+            limits: dict = {key: settings[key] for key in ('movetime', 'depth', 'nodes') if settings.get(key)}
+            if clocks is not None:
+                limits.update({'wtime': clocks[WHITE], 'btime': clocks[BLACK],
+                               'winc': increment * 1000, 'binc': increment * 1000})
+
+            think_start = time.perf_counter()
+            move = players[side].choose(position, opening, moves, limits)
+            if clocks is not None:
+                clocks[side] += increment * 1000 - (time.perf_counter() - think_start) * 1000
+                if clocks[side] < 0:
+                    result, reason = (BLACK_WINS if side == WHITE else WHITE_WINS), 'time forfeit'
+                    break
+
+            if move not in position.legal_moves():
+                result, reason = (BLACK_WINS if side == WHITE else WHITE_WINS), 'illegal move'
+                break
+            position.make_move(move)
+            moves.append(move)
+    finally:
+        for player in players:
+            player.close()
+
+    return {
+        'game': number,
+        'white': white_spec,
+        'black': black_spec,
+        'opening': opening,
+        'result': result,
+        'reason': reason,
+        'plies': len(moves),
+        'moves': ' '.join(move_name(move) for move in moves),
+        'final_fen': to_fen(position),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+# FENs to start games from: one FEN (or EPD) per line, or the final positions of the games of a PGN file
+def load_openings(path: str | None) -> list[str]:
+    if path is None:
+        return [STARTING_FEN]
+
+    with open(path, encoding='utf-8', errors='replace') as file:
+        if path.endswith('.pgn'):
+            openings: list[str] = list()
+            for tags, moves in read_games(file):
+                position = start_position(tags)
+                for position, _ in replay(tags, moves):
+                    pass
+                openings.append(to_fen(position))
+            return openings
+        return [' '.join(line.split()[:4]) for line in file if line.strip() and not line.startswith('#')]
+
+
+def elo_from_score(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return 400 * math.log10(score / (1 - score))
+
+
+def score_from_elo(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+# score, Elo difference and its 95% error margin of the first engine, from the game outcomes, the margin is
+# None while all games ended the same way
+def match_statistics(wins: int, draws: int, losses: int) -> dict:
+    games = wins + draws + losses
+    if not games:
+        return {'games': 0, 'score': 0.5, 'elo': 0.0, 'error': None}
+
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    error = (elo_from_score(score + margin) - elo_from_score(score - margin)) / 2 if variance else None
+    return {'games': games, 'score': score, 'elo': elo_from_score(score), 'error': error}
+
+
+# log likelihood ratio of the first engine being elo1 rather than elo0 stronger, with the normal
+# approximation of the game score used by engine testing frameworks
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    games = wins + draws + losses
+    if not games:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if not variance:  # every game ended the same way, nothing is known about the spread yet
+        return 0.0
+    score0, score1 = score_from_elo(elo0), score_from_elo(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+# 'H1' (the change gains at least elo1), 'H0' (it gains at most elo0) or None while undecided
+def sprt_verdict(llr: float, alpha: float = 0.05, beta: float = 0.05) -> str | None:
+    if llr >= math.log((1 - beta) / alpha):
+        return 'H1'
+    if llr <= math.log(beta / (1 - alpha)):
+        return 'H0'
+    return None
+
+
+def run(arguments) -> dict:
+    openings = load_openings(arguments.openings)
+    first, second = arguments.engine
+    settings = {'tc': parse_time_control(arguments.tc) if arguments.tc else None, 'movetime': arguments.movetime,
+                'depth': arguments.depth, 'nodes': arguments.nodes, 'max_plies': arguments.max_plies}
+
+    # every opening twice with the colors swapped, the first engine is white in the even games
+    tasks = list()
+    for number in range(arguments.games):
+        opening = openings[number // 2 % len(openings)]
+        white, black = (first, second) if number % 2 == 0 else (second, first)
+        tasks.append((number, opening, white, black, settings))
+
+    wins = draws = losses = 0
+    verdict = None
+    bounds = math.log(arguments.beta / (1 - arguments.alpha)), math.log((1 - arguments.beta) / arguments.alpha)
+    output = open(arguments.output, 'a') if arguments.output else None
+    pool = multiprocessing.Pool(arguments.concurrency)
+    try:
+        for record in pool.imap_unordered(play_game, tasks):
+            if output is not None:
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+
+            first_is_white = record['game'] % 2 == 0
+            if record['result'] == DRAWN:
+                draws += 1
+            elif (record['result'] == WHITE_WINS) == first_is_white:
+                wins += 1
+            else:
+                losses += 1
+
+            statistics = match_statistics(wins, draws, losses)
+            error = f'{statistics["error"]:.1f}' if statistics['error'] is not None else '?'
+            line = (f'{statistics["games"]}/{arguments.games} games: +{wins} ={draws} -{losses}, '
+                    f'Elo {statistics["elo"]:+.1f} +/- {error}')
+            if arguments.sprt is not None:
+                llr = sprt_llr(wins, draws, losses, *arguments.sprt)
+                verdict = sprt_verdict(llr, arguments.alpha, arguments.beta)
+                line += f', LLR {llr:.2f} ({bounds[0]:.2f}, {bounds[1]:.2f})'
+                if verdict is not None:
+                    line += f', {"passed" if verdict == "H1" else "failed"}'
+            print(line, flush=True)
+            if verdict is not None:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+        if output is not None:
+            output.close()
+
+    return {'wins': wins, 'draws': draws, 'losses': losses, **match_statistics(wins, draws, losses),
+            'sprt': verdict}
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Play a match between two engines and measure the Elo difference.')
+    parser.add_argument('--engine', action='append', required=True,
+                        help="'internal[:depth=N,nodes=N,hash=MB]' or a UCI engine command, given twice")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--tc', help='time control in seconds per game plus increment per move, e.g. 10+0.1')
+    parser.add_argument('--movetime', type=int, help='milliseconds per move')
+    parser.add_argument('--depth', type=int, help='search depth per move')
+    parser.add_argument('--nodes', type=int, help='nodes per move')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--openings', help='FEN/EPD file (one position per line) or PGN file')
+    parser.add_argument('--output', help='JSONL file every finished game is appended to')
+    parser.add_argument('--sprt', type=float, nargs=2, metavar=('ELO0', 'ELO1'),
+                        help='stop once the first engine is shown to be ELO0 or ELO1 stronger')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    arguments = parser.parse_args(arguments)
+
+    if len(arguments.engine) != 2:
+        parser.error('give exactly two engines')
+    engine_limits = all(spec.startswith('internal:') and ('depth=' in spec or 'nodes=' in spec)
+                        for spec in arguments.engine)
+    if not (arguments.tc or arguments.movetime or arguments.depth or arguments.nodes or engine_limits):
+        parser.error('give a time control (--tc) or a limit per move (--movetime, --depth or --nodes)')
+
+    summary = run(arguments)
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
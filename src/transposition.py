@@ -0,0 +1,110 @@
+# fixed-size hash table of search results indexed by zobrist key
+#
+# every entry takes two 64-bit words: the key xor-ed with the data, and the data itself, so an entry that is
+# half overwritten (e.g. by another process sharing the table) simply fails to match its key
+from array import array
+
+EXACT = 0
+LOWER_BOUND = 1  # score is at least this, the search failed high
+UPPER_BOUND = 2  # score is at most this, the search failed low
+
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 15  # scores are stored as unsigned 16-bit numbers
+
+
+def pack_entry(move: int, score: int, depth: int, flag: int, age: int) -> int:
+    return move | (score + SCORE_OFFSET) << 16 | min(depth, 255) << 32 | flag << 40 | age << 42
+
+
+class TranspositionTable:
+    # size_mb sets the memory budget, buffer can be given to place the table in memory shared with other
+    # processes, it must hold at least two 64-bit words
+    def __init__(self, size_mb: float = 16, buffer=None):
+        if buffer is not None:
+            words = memoryview(buffer).cast('B').cast('Q')
+            entries = len(words) // 2
+        else:
+            entries = max(int(size_mb * 1024 * 1024) // ENTRY_BYTES, 1)
+
+        # round down to a power of two so that the index is a simple mask of the key
+        self.entries: int = 1 << (entries.bit_length() - 1)
+        self.mask: int = self.entries - 1
+        self.table = words if buffer is not None else array('Q', bytes(self.entries * ENTRY_BYTES))
+
+        # bumped on every new search, entries from older searches are replaced first
+        self.age: int = 0
+
+        self.probes: int = 0
+        self.hits: int = 0
+        self.stores: int = 0
+        self.overwrites: int = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self.entries * ENTRY_BYTES
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def new_search(self):
+        self.age = (self.age + 1) & 63
+
+    def clear(self):
+        zeros = bytes(len(self.table) * 8)
+        if isinstance(self.table, array):
+            self.table = array('Q', zeros)
+        else:
+            self.table.cast('B')[:] = zeros
+        self.age = 0
+
+    def reset_counters(self):
+        self.probes = self.hits = self.stores = self.overwrites = 0
+
+    # returns (move, score, depth, flag) stored for a key, or None
+    def probe(self, key: int) -> tuple | None:
+        self.probes += 1
+        slot = (key & self.mask) * 2
+        data = self.table[slot + 1]
+        if data == 0 or self.table[slot] ^ data != key:
+            return None
+
+        self.hits += 1
+        return data & 0xFFFF, (data >> 16 & 0xFFFF) - SCORE_OFFSET, data >> 32 & 0xFF, data >> 40 & 3
+
+    # keeps the existing entry only if it is from the current search, for another position and deeper
+    def store(self, key: int, move: int, score: int, depth: int, flag: int):
+        slot = (key & self.mask) * 2
+        old_data = self.table[slot + 1]
+        if old_data:
+            old_key = self.table[slot] ^ old_data
+            if old_key != key and old_data >> 42 == self.age and old_data >> 32 & 0xFF > depth:
+                return
+            if old_key != key:
+                self.overwrites += 1
+
+            # keep the best move of an earlier search of the same position if this one has none
+            if old_key == key and not move:
+                move = old_data & 0xFFFF
+
+        data = pack_entry(move, score, depth, flag, self.age)
+        self.table[slot] = key ^ data
+        self.table[slot + 1] = data
+        self.stores += 1
+
+    # how full the table is, sampled from the first thousand entries (as reported by UCI hashfull, in permille)
+    def usage_permille(self) -> int:
+        sample = min(self.entries, 1000)
+        used = sum(1 for index in range(sample) if self.table[index * 2 + 1])
+        return used * 1000 // sample
+
+    def stats(self) -> dict:
+        return {
+            'entries': self.entries,
+            'size_bytes': self.size_bytes,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': round(self.hit_rate, 4),
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+        }
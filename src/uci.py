@@ -0,0 +1,259 @@
+# UCI protocol over stdin and stdout, for chess GUIs and scripts, never imports pygame
+#
+# supported: uci, isready, ucinewgame, setoption (Hash, Threads), position startpos/fen ... moves ...,
+# go depth/movetime/nodes/infinite/wtime/btime/winc/binc/movestogo, stop, quit
+#
+# run with: python uci.py
+# measure the time from starting the process to readyok with: python -m src.uci --startup [RUNS]
+import subprocess
+import sys
+import threading
+import time
+
+from src.bitboard import *
+from src.fen import STARTING_FEN, parse_fen
+from src.search import MATE_SCORE, MAX_PLY, Search
+from src.transposition import TranspositionTable
+
+ENGINE_NAME = 'Chess'
+ENGINE_AUTHOR = 'RighteousW'
+
+# name: (default, min, max) of every spin option
+OPTIONS = {'Hash': (16, 1, 4096), 'Threads': (1, 1, 64)}
+
+# share of the remaining clock time spent on one move when no move time is given
+MOVES_TO_GO = 30
+
+
+# seconds to spend on a move with remaining milliseconds on the clock and the increment per move
+def clock_time_limit(remaining: float, increment: float = 0, moves_to_go: int = MOVES_TO_GO) -> float:
+    return max(remaining / max(moves_to_go, 1) + increment * 0.8, 10) / 1000
+
+
+def score_text(score: int) -> str:
+    if score > MATE_SCORE - MAX_PLY:
+        return f'mate {(MATE_SCORE - score + 1) // 2}'
+    if score < -MATE_SCORE + MAX_PLY:
+        return f'mate -{(MATE_SCORE + score) // 2}'
+    return f'cp {score}'
+
+
+class UCIEngine:
+    def __init__(self, output=None):
+        self.output = output if output is not None else sys.stdout
+        self.output_lock = threading.Lock()
+
+        self.options: dict[str:int] = {name: default for name, (default, _, _) in OPTIONS.items()}
+        self.position: BitBoard = BitBoard.starting_position()
+
+        # the single-threaded search is created on the first go, so that starting up stays fast, the
+        # parallel one when Threads is set above 1
+        self.search: Search | None = None
+        self.parallel_search = None
+
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def send(self, line: str):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    # handles one line of input, returns False after quit
+    def handle(self, line: str) -> bool:
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+
+        match command:
+            case 'uci':
+                self.send(f'id name {ENGINE_NAME}')
+                self.send(f'id author {ENGINE_AUTHOR}')
+                for name, (default, minimum, maximum) in OPTIONS.items():
+                    self.send(f'option name {name} type spin default {default} min {minimum} max {maximum}')
+                self.send('uciok')
+            case 'isready':
+                self.send('readyok')
+            case 'ucinewgame':
+                self.stop()
+                if self.search is not None:
+                    self.search.table.clear()
+                if self.parallel_search is not None:
+                    self.parallel_search.clear()
+            case 'setoption':
+                self.set_option(arguments)
+            case 'position':
+                self.stop()
+                self.set_position(arguments)
+            case 'go':
+                self.stop()
+                self.go(arguments)
+            case 'stop':
+                self.stop()
+            case 'quit':
+                self.stop()
+                self.close()
+                return False
+            case _:
+                self.send(f'info string unknown command {command}')
+        return True
+
+    # setoption name NAME value VALUE
+    def set_option(self, arguments: list[str]):
+        if 'name' not in arguments or 'value' not in arguments:
+            return
+        name = ' '.join(arguments[arguments.index('name') + 1:arguments.index('value')])
+        if name not in OPTIONS:
+            self.send(f'info string unknown option {name}')
+            return
+        try:
+            value = int(arguments[arguments.index('value') + 1])
+        except (IndexError, ValueError):
+            return
+
+        _, minimum, maximum = OPTIONS[name]
+        self.stop()
+        self.options[name] = min(max(value, minimum), maximum)
+
+        # the searches are made again with the new settings
+        self.search = None
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+            self.parallel_search = None
+
+        # worker processes are started here and not in the search thread: forking while the main thread is
+        # blocked reading stdin leaves the children stuck on the stdin lock
+        if self.options['Threads'] > 1:
+            from src.parallel_search import ParallelSearch
+
+            self.parallel_search = ParallelSearch(self.options['Threads'], self.options['Hash'])
+
+    # position startpos|fen FEN [moves MOVE ...]
+    def set_position(self, arguments: list[str]):
+        moves_at = arguments.index('moves') if 'moves' in arguments else len(arguments)
+        try:
+            if arguments and arguments[0] == 'fen':
+                position = parse_fen(' '.join(arguments[1:moves_at]))
+            else:
+                position = parse_fen(STARTING_FEN)
+        except ValueError as error:
+            self.send(f'info string {error}')
+            return
+
+        for name in arguments[moves_at + 1:]:
+            move = next((move for move in position.legal_moves() if move_name(move) == name), None)
+            if move is None:
+                self.send(f'info string illegal move {name}')
+                break
+            position.make_move(move)
+        self.position = position
+
+    # keyword arguments of Search.search for the arguments of a go command, and whether it is go infinite
+    def search_limits(self, arguments: list[str]) -> tuple:
+        values: dict[str:int] = dict()
+        for keyword, value in zip(arguments, arguments[1:]):
+            if value.lstrip('-').isdigit():
+                values[keyword] = int(value)
+
+        limits = {'max_depth': values.get('depth', MAX_PLY), 'time_limit': None, 'node_limit': values.get('nodes')}
+        if 'movetime' in values:
+            limits['time_limit'] = values['movetime'] / 1000
+        else:
+            remaining = values.get('wtime' if self.position.side == WHITE else 'btime')
+            if remaining is not None:
+                increment = values.get('winc' if self.position.side == WHITE else 'binc', 0)
+                limits['time_limit'] = clock_time_limit(remaining, increment, values.get('movestogo', MOVES_TO_GO))
+        return limits, 'infinite' in arguments
+
+    def go(self, arguments: list[str]):
+        limits, infinite = self.search_limits(arguments)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_search, args=(self.position.copy(), limits, infinite),
+                                       daemon=True)
+        self.thread.start()
+
+    def run_search(self, position: BitBoard, limits: dict, infinite: bool):
+        if self.options['Threads'] > 1:
+            result = self.run_parallel_search(position, limits)
+        else:
+            if self.search is None:
+                self.search = Search(TranspositionTable(self.options['Hash']), self.stop_event)
+            result = self.search.search(position, on_info=self.send_info, **limits)
+
+        # a go infinite search only reports its move once it is told to stop
+        if infinite:
+            self.stop_event.wait()
+        self.send(f'bestmove {move_name(result["best_move"]) if result["best_move"] else "0000"}')
+
+    def run_parallel_search(self, position: BitBoard, limits: dict) -> dict:
+        # stop is forwarded to the workers, which share a process event instead of self.stop_event
+        self.parallel_search.stop_event.clear()
+        forward = threading.Thread(target=self.forward_stop, args=(self.parallel_search.stop_event,), daemon=True)
+        forward.start()
+        result = self.parallel_search.search(position, **limits)
+        if result['depth']:
+            self.send_info(result)
+        return result
+
+    def forward_stop(self, process_event):
+        while not self.stop_event.wait(0.01):
+            if process_event.is_set():
+                return
+        process_event.set()
+
+    def send_info(self, info: dict):
+        pv = ' '.join(move_name(move) for move in info['pv'])
+        self.send(f'info depth {info["depth"]} score {score_text(info["score"])} nodes {info["nodes"]} '
+                  f'nps {info["nps"]} time {round(info["time"] * 1000)} pv {pv}'.rstrip())
+
+    # stops a running search and waits for it to report its move
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+            self.parallel_search = None
+
+
+# seconds from starting an engine process to its readyok, the best of several runs
+def startup_latency(runs: int = 10) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-m', 'src.uci'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   text=True)
+        process.stdin.write('isready\n')
+        process.stdin.flush()
+        while process.stdout.readline().strip() != 'readyok':
+            pass
+        best = min(best, time.perf_counter() - start)
+        process.stdin.write('quit\n')
+        process.stdin.flush()
+        process.wait()
+    return best
+
+
+def main(arguments: list[str] | None = None) -> int:
+    arguments = sys.argv[1:] if arguments is None else arguments
+    if arguments and arguments[0] == '--startup':
+        runs = int(arguments[1]) if len(arguments) > 1 else 10
+        print(f'startup to readyok: {startup_latency(runs) * 1000:.1f} ms (best of {runs})')
+        return 0
+
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    else:
+        engine.stop()
+        engine.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+# random 64-bit numbers xor-ed together to give every position a key, generated from a fixed seed so
+# keys are the same in every process and every run
+import random
+
+_random = random.Random(0x5A0B)
+
+# one number per piece index (see bitboard.piece_index) and square
+ZOBRIST_PIECES: list[list[int]] = [[_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+
+# xor-ed in when black is to move
+ZOBRIST_BLACK_TO_MOVE: int = _random.getrandbits(64)
+
+# one number per combination of castling rights
+ZOBRIST_CASTLING: list[int] = [0] + [_random.getrandbits(64) for _ in range(15)]
+
+# one number per file of the en passant square
+ZOBRIST_EN_PASSANT: list[int] = [_random.getrandbits(64) for _ in range(8)]
+
+
+# the en passant part of a key, pawns being the pawns of the side to move: the file only counts if one of them
+# stands next to the pawn that just moved two squares and so can capture it, otherwise the position is the
+# same as when that pawn had arrived any other way and has to repeat it
+def en_passant_key(en_passant: int, pawns: int) -> int:
+    if en_passant < 0:
+        return 0
+    pushed = en_passant - 8 if en_passant >= 32 else en_passant + 8  # the square of the pushed pawn
+    file = en_passant % 8
+    if file and pawns >> pushed - 1 & 1 or file < 7 and pawns >> pushed + 1 & 1:
+        return ZOBRIST_EN_PASSANT[file]
+    return 0
+
+
+# key of a position computed from scratch, BitBoard keeps its key up to date incrementally instead
+def compute_key(position) -> int:
+    key = 0
+    for square, index in enumerate(position.mailbox):
+        if index >= 0:
+            key ^= ZOBRIST_PIECES[index][square]
+    if position.side:
+        key ^= ZOBRIST_BLACK_TO_MOVE
+    pawns = position.pieces[6 if position.side else 0]
+    return key ^ ZOBRIST_CASTLING[position.castling] ^ en_passant_key(position.en_passant, pawns)
@@ -0,0 +1,23 @@
+# run with: python -m pytest tests
+import json
+
+from src.analysis import analyse_chunk
+from src.evaluation import evaluate_batch
+from src.fen import parse_fen
+
+FENS = ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq - 0 1',
+        '7k/6Q1/6K1/8/8/8/8/8 b - - 0 1')
+
+
+def test_chunks_are_evaluated_in_one_batch():
+    lines = [FENS[0], 'not a fen', FENS[1] + ' bm e2a6;', FENS[2], FENS[3]]
+    output = analyse_chunk((list(enumerate(lines, 1)), 0))
+    results = [json.loads(line) for line in output.splitlines()]
+    assert [result['line'] for result in results] == [1, 2, 3, 4, 5]
+    assert 'error' in results[1]
+    evaluations = evaluate_batch(parse_fen(fen) for fen in FENS)
+    assert [results[index]['evaluation'] for index in (0, 2, 3, 4)] == evaluations.tolist()
+    assert evaluations[0] == 0 and evaluations[1] == -evaluations[2]
+    assert results[4]['status'] == 'checkmate'
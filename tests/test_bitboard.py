@@ -0,0 +1,37 @@
+# run with: python -m pytest tests
+import random
+
+from src.bitboard import BitBoard, move_name
+from src.fen import parse_fen
+from src.game_state import GameState
+from src.zobrist import compute_key
+
+
+def test_incremental_key_equals_the_computed_one():
+    generator = random.Random(0)
+    for _ in range(50):
+        position = BitBoard.starting_position()
+        for _ in range(100):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(generator.choice(moves))
+            assert position.key == compute_key(position)
+        while position.history:
+            position.unmake_move()
+            assert position.key == compute_key(position)
+        assert not position.repetitions
+
+
+def test_en_passant_square_without_a_capture_does_not_change_the_key():
+    assert parse_fen('4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1').key == parse_fen('4k3/8/8/8/4P3/8/8/4K3 b - - 0 1').key
+    assert parse_fen('4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1').key != parse_fen('4k3/8/8/8/3pP3/8/8/4K3 b - - 0 1').key
+
+
+def test_position_after_a_double_push_repeats():
+    game = GameState()
+    for name in 'e2e4 b8c6 g1f3 c6b8 f3g1 b8c6 g1f3 c6b8'.split():
+        game.make_move(next(move for move in game.moves() if move_name(move) == name))
+        assert game.status() == 'ongoing'
+    game.make_move(next(move for move in game.moves() if move_name(move) == 'f3g1'))
+    assert game.status() == 'threefold_repetition'
@@ -0,0 +1,83 @@
+# run with: python -m pytest tests
+from src.bitboard import BitBoard
+from src.bitboard import move_name
+from src.fen import STARTING_FEN, parse_fen, to_fen
+from src.zobrist import compute_key
+
+FENS = (
+    STARTING_FEN,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - - 12 40',
+    'r3k3/8/8/8/8/8/8/4K2R b Kq - 0 1',
+)
+
+
+def test_fen_round_trips():
+    for fen in FENS:
+        position = parse_fen(fen)
+        assert to_fen(position, int(fen.split()[5])) == fen
+        assert position.key == compute_key(position)
+        assert position.occupancy[2] == position.occupancy[0] | position.occupancy[1]
+        assert position.history == [] and position.repetitions == {}
+
+
+def test_parsed_starting_position_equals_the_built_one():
+    parsed, built = parse_fen(STARTING_FEN), BitBoard.starting_position()
+    for name in BitBoard.__slots__:
+        assert getattr(parsed, name) == getattr(built, name), name
+
+
+def test_castling_rights_in_any_order():
+    assert parse_fen('r3k2r/8/8/8/8/8/8/R3K2R w qkQK - 0 1').castling == parse_fen(
+        'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1').castling
+
+
+def test_invalid_fens_are_refused():
+    for fen in ('', '8/8/8 w - -', '8/8/8/8/8/8/8/8/8 w - - 0 1', '8/8/8/8/8/8/8/8 x - - 0 1',
+                '8/8/8/8/8/8/8/8 w X - 0 1', '8/8/8/8/8/8/8/8 w - e4 0 1', '8/8/8/8/8/8/8/9 w - - 0 1',
+                '8/8/8/8/8/8/8/7 w - - 0 1', '8/8/8/3k4/8/8/8/8 w - - 0 1', '4k3/8/8/8/8/8/8/8 b - - 0 1',
+                '4k3/8/8/8/8/8/8/2K1K3 w - - 0 1', '4k3/8/8/8/8/8/8/P3K3 w - - 0 1', '3pk3/8/8/8/8/8/8/4K3 w - - 0 1'):
+        try:
+            parse_fen(fen)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{fen!r} was accepted')
+
+
+def test_castling_rights_without_king_and_rook_are_dropped():
+    position = parse_fen('4k3/8/8/8/8/8/8/4K3 w KQkq - 0 1')
+    assert position.castling == 0
+    assert not {'e1g1', 'e1c1'} & {move_name(move) for move in position.legal_moves()}
+
+    position = parse_fen('r3k3/8/8/8/8/8/8/4K2R w KQkq - 0 1')
+    assert to_fen(position) == 'r3k3/8/8/8/8/8/8/4K2R w Kq - 0 1'
+    assert position.key == compute_key(position)
+
+    # a board edited after parsing can't castle with a missing rook either
+    position = parse_fen('4k3/8/8/8/8/8/8/4K2R w K - 0 1')
+    position.remove_piece(7)
+    assert 'e1g1' not in {move_name(move) for move in position.legal_moves()}
+
+
+def test_en_passant_square_needs_a_pawn_to_capture():
+    for fen in ('4k3/8/8/3P4/8/8/8/4K3 w - e6 0 1',  # no pawn on e5
+                '4k3/8/8/3Pp3/8/8/8/4K3 w - e3 0 1',  # wrong rank for white to move
+                '4k3/8/8/3Pp3/8/8/8/4K3 b - e6 0 1',  # black to move, white can't have skipped e6
+                '4k3/8/4n3/3Pp3/8/8/8/4K3 w - e6 0 1',  # e6 is taken
+                '4k3/4n3/8/3Pp3/8/8/8/4K3 w - e6 0 1',  # the pawn can't have come from e7
+                '4k3/8/8/3PP3/8/8/8/4K3 w - e6 0 1'):  # a white pawn in front
+        try:
+            parse_fen(fen)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{fen!r} was accepted')
+
+    position = parse_fen('4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1')
+    move = next(move for move in position.legal_moves() if move_name(move) == 'd5e6')
+    position.make_move(move)
+    assert to_fen(position) == '4k3/8/4P3/8/8/8/8/4K3 b - - 0 1'
+    position.unmake_move()
+    assert to_fen(position) == '4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1'
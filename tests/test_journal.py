@@ -0,0 +1,157 @@
+# run with: python -m pytest tests
+import os
+import random
+
+from src import journal
+from src.bitboard import move_name
+from src.journal import GameJournal, open_game, resume, snapshot_path
+from src.game_state import GameState
+
+
+def play(game: GameState, names: list[str]):
+    for name in names:
+        game.make_move(next(move for move in game.moves() if move_name(move) == name))
+
+
+# plays random moves and take backs, returns the FEN the game ended on
+def play_randomly(game: GameState, plies: int, seed: int) -> str:
+    generator = random.Random(seed)
+    for _ in range(plies):
+        if game.moves_played and generator.random() < 0.15:
+            game.undo()
+        elif game.moves():
+            game.make_move(generator.choice(game.moves()))
+    return game.fen()
+
+
+def test_resume_equals_uninterrupted_game(tmp_path):
+    for seed in range(20):
+        path = str(tmp_path / f'{seed}.journal')
+        game = open_game(path, snapshot_every=7)
+        fen = play_randomly(game, 100, seed)
+        moves_played = list(game.moves_played)
+        game.journal.close()
+
+        resumed = resume(path)
+        assert resumed.fen() == fen
+        assert resumed.moves_played == moves_played
+        resumed.journal.close()
+
+
+def test_resume_without_snapshot_replays_the_journal(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=0)
+    fen = play_randomly(game, 60, 1)
+    game.journal.close()
+
+    assert resume(path).fen() == fen
+
+
+def test_resume_cuts_off_a_torn_record(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=5)
+    fen = play_randomly(game, 40, 2)
+    game.journal.close()
+    with open(path, 'ab') as file:
+        file.write(b'\x01')  # half of a record, as left by a crash during a write
+
+    resumed = resume(path)
+    assert resumed.fen() == fen
+    play(resumed, [move_name(resumed.moves()[0])])
+    fen = resumed.fen()
+    resumed.journal.close()
+    assert resume(path).fen() == fen
+
+
+def test_moves_before_the_snapshot_can_be_taken_back(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=4)
+    play(game, ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'f8c5', 'd2d3'])
+    game.journal.close()
+
+    resumed = resume(path)
+    assert len(resumed.moves_played) == 7
+    while resumed.undo():
+        pass
+    assert resumed.fen() == GameState().fen()
+    resumed.journal.close()
+
+    # the take backs were journaled as well
+    assert resume(path).fen() == GameState().fen()
+
+
+def test_take_back_past_the_snapshot_is_resumed(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=4)
+    play(game, ['e2e4', 'e7e5', 'g1f3', 'b8c6'])
+    game.undo()
+    game.undo()
+    fen = game.fen()
+    game.journal.close()
+
+    assert resume(path).fen() == fen
+
+
+def test_a_snapshot_of_another_game_is_ignored(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=2)
+    play(game, ['e2e4', 'e7e5'])
+    game.journal.close()
+    with open(snapshot_path(path), 'rb') as file:
+        stale = file.read()
+
+    game = GameState()
+    game.journal = GameJournal.create(path, game)
+    play(game, ['d2d4', 'd7d5', 'c2c4'])  # long enough for the stale snapshot to fit
+    fen = game.fen()
+    game.journal.close()
+    with open(snapshot_path(path), 'wb') as file:
+        file.write(stale)
+
+    assert resume(path).fen() == fen
+
+
+def test_repetitions_before_a_restart_are_counted(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=4)
+    play(game, ['g1f3', 'g8f6', 'f3g1', 'f6g8', 'g1f3'])
+    game.journal.close()
+
+    resumed = resume(path)
+    play(resumed, ['g8f6', 'f3g1'])
+    assert resumed.status() == 'ongoing'
+    play(resumed, ['f6g8'])  # the starting position for the third time
+    assert resumed.status() == 'threefold_repetition'
+    resumed.journal.close()
+
+
+def test_resume_replays_only_the_records_after_the_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=8)
+    play_randomly(game, 30, 3)
+    reference = list(game.position.history)
+    game.journal.close()
+
+    offsets = list()
+    replay_records = journal.replay_records
+    monkeypatch.setattr(journal, 'replay_records', lambda game, data, offset: offsets.append(offset) or
+                        replay_records(game, data, offset))
+    resumed = resume(path)
+    assert offsets == [journal.read_snapshot(path)[0]]
+    assert resumed.position.history == reference
+    assert os.path.getsize(journal.history_path(path)) == resumed.journal.snapshot_ply * journal.HISTORY.size
+
+
+def test_a_damaged_history_falls_back_to_the_journal(tmp_path):
+    path = str(tmp_path / 'game.journal')
+    game = open_game(path, snapshot_every=4)
+    fen = play_randomly(game, 30, 4)
+    game.journal.close()
+    with open(journal.history_path(path), 'r+b') as file:
+        file.write(b'\xff')  # as left by a crash between writing the history and the snapshot
+
+    resumed = resume(path)
+    assert resumed.fen() == fen
+    while resumed.undo():
+        pass
+    assert resumed.fen() == GameState().fen()
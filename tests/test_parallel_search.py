@@ -0,0 +1,25 @@
+# run with: python -m pytest tests
+import pytest
+
+from src.fen import STARTING_FEN, parse_fen
+from src.parallel_search import ParallelSearch
+
+
+def test_dead_workers_are_not_waited_for():
+    parallel_search = ParallelSearch(3, 1)
+    try:
+        assert parallel_search.search(parse_fen(STARTING_FEN), max_depth=2)['depth'] == 2
+
+        # without the main worker the deepest helper result is returned
+        parallel_search.processes[0].kill()
+        parallel_search.processes[0].join()
+        result = parallel_search.search(parse_fen(STARTING_FEN), max_depth=2)
+        assert result['depth'] == 2 and result['best_move']
+
+        for process in parallel_search.processes[1:]:
+            process.kill()
+            process.join()
+        with pytest.raises(RuntimeError):
+            parallel_search.search(parse_fen(STARTING_FEN), max_depth=2)
+    finally:
+        parallel_search.close()
@@ -0,0 +1,23 @@
+# run with: python -m pytest tests
+import pytest
+
+from src.fen import parse_fen
+from src.perft import PERFT_POSITIONS, divide, main, perft
+
+
+def test_shallow_counts_of_the_standard_positions():
+    for name, fen, expected in PERFT_POSITIONS:
+        position = parse_fen(fen)
+        for depth in (1, 2):
+            assert perft(position, depth) == expected[depth - 1], (name, depth)
+        assert sum(divide(position, 2).values()) == expected[1], name
+
+
+def test_depth_zero_counts_the_position_itself():
+    assert perft(parse_fen(PERFT_POSITIONS[0][1]), 0) == 1
+    assert main(['--fen', PERFT_POSITIONS[0][1], '--depth', '0']) == 0
+
+
+def test_negative_depth_is_refused():
+    with pytest.raises(SystemExit):
+        main(['--depth', '-1'])
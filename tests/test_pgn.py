@@ -0,0 +1,96 @@
+# run with: python -m pytest tests
+import io
+
+from src.bitboard import *
+from src.fen import parse_fen, to_fen
+from src.pgn import game_pgn, move_san, parse_san, play_san, replay_games
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+# positions with castling, promotions, under-promotions, en passant, pins, checks and disambiguation
+POSITIONS = (
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    KIWIPETE,
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+    '1k6/8/8/8/R6R/8/8/R3K3 w Q - 0 1',
+    '4k3/8/8/8/8/8/8/4K2R w K - 0 1',
+)
+
+
+def find_move(position: BitBoard, name: str) -> int:
+    return next(move for move in position.legal_moves() if move_name(move) == name)
+
+
+def test_san_of_known_moves():
+    expected = {
+        (KIWIPETE, 'e1g1'): 'O-O',
+        (KIWIPETE, 'e1c1'): 'O-O-O',
+        (KIWIPETE, 'e5f7'): 'Nxf7',
+        (KIWIPETE, 'd5e6'): 'dxe6',
+        (KIWIPETE, 'c3b1'): 'Nb1',
+        (KIWIPETE, 'e2b5'): 'Bb5',
+        (KIWIPETE, 'f3f6'): 'Qxf6',
+        ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', 'd7c8q'): 'dxc8=Q',
+        ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', 'd7c8n'): 'dxc8=N',
+        ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', 'e5f6'): 'exf6',
+        ('1k6/8/8/8/R6R/8/8/R3K3 w Q - 0 1', 'a4d4'): 'Rad4',
+        ('1k6/8/8/8/R6R/8/8/R3K3 w Q - 0 1', 'a4a3'): 'R4a3',
+        ('1k6/8/8/8/R6R/8/8/R3K3 w Q - 0 1', 'a4a8'): 'Ra8+',
+        ('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'a1a8'): 'Ra8#',
+        ('5k2/8/8/8/8/8/8/4K2R w K - 0 1', 'e1g1'): 'O-O+',
+    }
+    for (fen, name), san in expected.items():
+        position = parse_fen(fen)
+        move = find_move(position, name)
+        assert move_san(position, move) == san, (fen, name)
+        assert parse_san(position, san) == move, (fen, san)
+        assert to_fen(position) == to_fen(parse_fen(fen))  # neither changed the position
+
+
+def test_every_legal_move_round_trips():
+    for fen in POSITIONS:
+        position = parse_fen(fen)
+        for move in position.legal_moves():
+            san = move_san(position, move)
+            assert parse_san(position, san) == move, (fen, san)
+            assert parse_san(position, san, check_legal=False) == move, (fen, san)
+            assert play_san(position, san) == move, (fen, san)
+            position.unmake_move()
+
+
+def test_illegal_and_ambiguous_moves_are_rejected():
+    position = parse_fen(KIWIPETE)
+    for san in ('Nd4', 'Ke2', 'O-O-O-O', 'e5', 'Rd1d2'):
+        try:
+            parse_san(position, san)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{san} was accepted')
+
+    position = parse_fen('1k6/8/8/8/R6R/8/8/R3K3 w Q - 0 1')
+    fen = to_fen(position)
+    try:
+        play_san(position, 'Rd4')
+    except ValueError:
+        assert to_fen(position) == fen
+    else:
+        raise AssertionError('Rd4 is ambiguous')
+
+
+def test_written_game_reads_back():
+    moves = list()
+    position = parse_fen(KIWIPETE)
+    for name in ('e1c1', 'e8g8', 'd5e6', 'a6e2', 'e6f7', 'f8f7', 'g2h3'):
+        moves.append(find_move(position, name))
+        position.make_move(moves[-1])
+
+    text = game_pgn(moves, {'Event': 'test', 'Result': '*'}, parse_fen(KIWIPETE))
+    games = list(replay_games(io.StringIO(text + '\n' + text)))
+    assert len(games) == 2
+    for tags, replayed in games:
+        assert tags['FEN'] == KIWIPETE
+        assert replayed == moves
@@ -0,0 +1,29 @@
+# run with: python -m pytest tests
+from src.bitboard import move_name
+from src.fen import STARTING_FEN, parse_fen
+from src.polyglot import ENTRY, PolyglotBook, polyglot_key
+
+
+# the polyglot encoding of a move name such as e1h1
+def polyglot_move(name: str) -> int:
+    from_square = ord(name[0]) - ord('a') + 8 * (int(name[1]) - 1)
+    to_square = ord(name[2]) - ord('a') + 8 * (int(name[3]) - 1)
+    return to_square | from_square << 6
+
+
+def test_known_keys():
+    assert polyglot_key(parse_fen(STARTING_FEN)) == 0x463B96181691FC9C
+    assert polyglot_key(parse_fen('rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2')) == \
+        0x0756B94461C50FB0
+
+
+def test_only_king_moves_are_read_as_castling(tmp_path):
+    castling = '4k3/8/8/8/8/8/8/4K2R w K - 0 1'
+    capture = '4k3/8/8/8/8/8/8/K3R2r w - - 0 1'  # the rook on e1 takes the rook on h1
+    entries = sorted((polyglot_key(parse_fen(fen)), polyglot_move('e1h1'), 1, 0) for fen in (castling, capture))
+    path = tmp_path / 'book.bin'
+    path.write_bytes(b''.join(ENTRY.pack(*entry) for entry in entries))
+
+    with PolyglotBook(str(path)) as book:
+        assert [move_name(move) for move, _ in book.moves(parse_fen(castling))] == ['e1g1']
+        assert [move_name(move) for move, _ in book.moves(parse_fen(capture))] == ['e1h1']
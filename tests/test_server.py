@@ -0,0 +1,92 @@
+# run with: python -m pytest tests
+import asyncio
+import json
+
+from src import server as server_module
+from src.server import GameServer
+
+
+def handle(server: GameServer, request) -> dict:
+    return asyncio.run(server.handle_line(json.dumps(request).encode()))
+
+
+def test_fields_of_the_wrong_type_are_refused():
+    server = GameServer()
+    for request in ({'op': 'new', 'fen': 123}, {'op': 'new', 'fen': ['8/8/8/8/8/8/8/8 w - - 0 1']},
+                    {'op': 'new', 'fen': 'not a fen'}, {'op': 'move'}):
+        assert handle(server, request)['ok'] is False, request
+
+    game_id = handle(server, {'op': 'new'})['game']
+    for move in (None, 12, {'from': 'e2'}, ['e2e4']):
+        reply = handle(server, {'op': 'move', 'game': game_id, 'move': move, 'id': 7})
+        assert reply['ok'] is False and reply['id'] == 7, move
+    assert handle(server, {'op': 'move', 'game': game_id, 'move': 'e2e4'})['ok']
+    assert handle(server, {'op': 'stats'})['moves'] == 1
+
+
+def test_journaled_games_are_resumed_after_being_dropped(tmp_path):
+    async def play():
+        server = GameServer(journal_directory=str(tmp_path))
+        reply = await server.handle_line(b'{"op": "new"}')
+        game_id = reply['game']
+        for move in ('e2e4', 'e7e5', 'g1f3'):
+            reply = await server.handle_line(json.dumps({'op': 'move', 'game': game_id, 'move': move}).encode())
+            assert reply['ok']
+        server.close()
+        server.games.clear()  # as if evicted
+
+        # two requests resuming the same game at once share one copy of it
+        first, second = await asyncio.gather(server.find_game(game_id), server.find_game(game_id))
+        assert first is second is server.games[game_id]
+        reply = await server.handle_line(json.dumps({'op': 'undo', 'game': game_id}).encode())
+        assert reply['fen'].startswith('rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w')
+        reply = await server.handle_line(json.dumps({'op': 'close', 'game': game_id}).encode())
+        assert reply['ok'] and game_id not in server.games
+        return server
+
+    server = asyncio.run(play())
+    assert server.moves_played == 3
+
+
+def test_invalid_positions_are_refused_before_a_game_is_created(tmp_path):
+    server = GameServer(journal_directory=str(tmp_path))
+    for fen in ('4k3/8/8/8/8/8/8/4K3 w - e6 0 1', '4k3/8/8/8/8/8/8/8 w - - 0 1', '4k3/8/8/8/8/8/8/3KK3 w - - 0 1',
+                'P3k3/8/8/8/8/8/8/4K3 w - - 0 1'):
+        assert handle(server, {'op': 'new', 'fen': fen})['ok'] is False, fen
+    assert not server.games and not list(tmp_path.iterdir())
+
+
+def test_closed_games_are_deleted(tmp_path):
+    server = GameServer(journal_directory=str(tmp_path))
+    game_id = handle(server, {'op': 'new'})['game']
+    for move in ('e2e4', 'e7e5', 'g1f3'):
+        assert handle(server, {'op': 'move', 'game': game_id, 'move': move})['ok']
+    server.games[game_id].game.journal.snapshot(server.games[game_id].game)
+    assert len(list(tmp_path.iterdir())) == 3  # journal, snapshot and history
+    assert handle(server, {'op': 'close', 'game': game_id})['ok']
+    assert not list(tmp_path.iterdir())
+    assert handle(server, {'op': 'state', 'game': game_id})['ok'] is False
+
+
+def test_games_evicted_between_requests_are_resumed(tmp_path, monkeypatch):
+    monkeypatch.setattr(server_module, 'EVICTION_INTERVAL', 0)
+
+    async def play():
+        server = GameServer(idle_timeout=0, journal_directory=str(tmp_path))
+        eviction = asyncio.create_task(server.evict_idle_games())
+        game_id = (await server.handle_line(b'{"op": "new"}'))['game']
+        moves = ('e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1b5', 'a7a6', 'b5a4', 'g8f6')
+        for move in moves:
+            request = json.dumps({'op': 'move', 'game': game_id, 'move': move}).encode()
+            replies = await asyncio.gather(server.handle_line(request), server.handle_line(b'{"op": "stats"}'),
+                                           server.handle_line(json.dumps({'op': 'state', 'game': game_id}).encode()))
+            assert replies[0]['ok'] and replies[2]['ok'], replies
+            await asyncio.sleep(0)
+        reply = await server.handle_line(json.dumps({'op': 'state', 'game': game_id}).encode())
+        eviction.cancel()
+        server.close()
+        return server, reply
+
+    server, reply = asyncio.run(play())
+    assert reply['fen'] == 'r1bqkb1r/1ppp1ppp/p1n2n2/4p3/B3P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 2 5'
+    assert server.evicted > 0 and server.moves_played == 8
@@ -0,0 +1,48 @@
+# run with: python -m pytest tests
+import numpy
+import pytest
+
+from src.fen import parse_fen
+from src.tablebase import DRAW, LOSS, MAX_PIECES, WIN, Tablebase, generate, parse_signature, table_layout
+
+
+def test_signatures_are_normalized():
+    assert parse_signature('kqk') == 'KQvK'
+    assert parse_signature('K-KQ') == 'KQvK'
+    assert parse_signature('KPvKR') == 'KRvKP'
+
+
+def test_tables_with_too_many_pieces_are_refused(tmp_path):
+    tablebase = Tablebase(str(tmp_path))
+    signature = 'KQRvK' + 'P' * (MAX_PIECES - 3)
+    with pytest.raises(ValueError):
+        generate(signature, tablebase)
+    assert not list(tmp_path.iterdir())  # refused before any smaller table was generated
+
+
+def test_drawn_material_needs_no_table(tmp_path):
+    tablebase = Tablebase(str(tmp_path))
+    assert tablebase.probe(parse_fen('8/8/8/3k4/8/8/8/KB6 w - - 0 1')) == (DRAW, 0)
+    assert tablebase.probe(parse_fen('8/8/8/3k4/8/8/8/KQ6 w - - 0 1')) is None
+
+
+def test_symmetric_positions_share_one_value(tmp_path):
+    tablebase = Tablebase(str(tmp_path))
+    generate('KQvK', tablebase)
+    assert table_layout('KQvK').size == 2 * 462 * 64
+    assert tablebase.probe(parse_fen('7k/8/6K1/8/8/8/8/1Q6 w - - 0 1')) == (WIN, 1)
+    assert tablebase.probe(parse_fen('7k/6Q1/6K1/8/8/8/8/8 b - - 0 1')) == (LOSS, 0)
+
+    # the same position turned and reflected in all 8 ways, and with the colors the other way around
+    for fen in ('8/8/8/8/8/2k5/8/K2Q4 b - - 0 1', 'K2Q4/8/2k5/8/8/8/8/8 b - - 0 1', '8/8/8/8/8/5k2/8/4Q2K b - - 0 1',
+                '8/8/8/8/Q7/2k5/8/K7 b - - 0 1', '7K/8/5k2/7Q/8/8/8/8 b - - 0 1', '4Q2K/8/5k2/8/8/8/8/8 b - - 0 1',
+                '8/8/8/8/7Q/5k2/8/7K b - - 0 1', 'K7/8/2k5/Q7/8/8/8/8 b - - 0 1', 'k2q4/8/2K5/8/8/8/8/8 w - - 0 1'):
+        assert tablebase.probe(parse_fen(fen)) == tablebase.probe(parse_fen('8/8/8/8/8/2k5/8/K2Q4 b - - 0 1')), fen
+
+
+def test_positions_with_an_en_passant_capture_are_not_probed(tmp_path):
+    tablebase = Tablebase(str(tmp_path))
+    tablebase.add('KPvKP', numpy.zeros(table_layout('KPvKP').size, dtype=numpy.int16))  # every position a draw
+    assert tablebase.probe(parse_fen('4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 2')) is None
+    assert tablebase.probe(parse_fen('4k3/8/8/3Pp3/8/8/8/4K3 w - - 0 2')) == (DRAW, 0)
+    assert tablebase.probe(parse_fen('4k3/8/8/1P2p3/8/8/8/4K3 w - e6 0 2')) == (DRAW, 0)  # no pawn can take
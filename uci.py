@@ -0,0 +1,7 @@
+# entry point without a window, speaks the UCI protocol over stdin and stdout (see src/uci.py)
+import sys
+
+from src.uci import main
+
+if __name__ == '__main__':
+    sys.exit(main())
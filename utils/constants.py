@@ -1,7 +1,8 @@
-from pygame import Vector2
 from pygame.color import Color
 
+from src.bitboard import BLACK, EMPTY, PAWN, piece_index
 from src.piece import Piece
+from utils.rules import *
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 600
@@ -9,6 +10,20 @@ SCREEN_DIMENSIONS = (SCREEN_WIDTH, SCREEN_HEIGHT)
 
 FRAME_RATE = 120
 
+# only redraw changed tiles and sleep until the next event, instead of redrawing every frame
+EVENT_DRIVEN_RENDERING = True
+
+# color the computer plays ('white' or 'black'), None for two human players
+ENGINE_COLOR = None
+ENGINE_THINK_TIME = 2.0  # seconds per move
+ENGINE_POLL_INTERVAL = 50  # milliseconds between checks for engine output while it is thinking
+ENGINE_BOOK = None  # path of a Polyglot opening book the engine plays from while the position is in it
+ENGINE_TABLEBASES = None  # directory of tablebases made with src.tablebase, looked up by the engine's search
+
+PROFILE_HISTORY = 100000  # frames kept by the profiler for the trace, the oldest are dropped first
+PROFILE_OVERLAY_FRAMES = 120  # frames the on-screen profiler overlay averages over
+PROFILE_FONT_SIZE = 18
+
 COLOR_BLACK = Color(0, 0, 0)
 COLOR_WHITE = Color(255, 255, 255)
 COLOR_SELECTED_PIECE = Color(0, 200, 200)
@@ -16,22 +31,6 @@ COLOR_POSSIBLE_TILES = Color(0, 240, 140)
 LIGHT_TILE_COLOR = Color(242, 225, 195)
 DARK_TILE_COLOR = Color(195, 160, 130)
 
-POSSIBLE_PROMOTIONS = {
-    'pawn',
-    'rook',
-    'knight',
-    'bishop',
-    'queen'
-}
-PIECE_VALUES = {
-    'pawn': 1,
-    'rook': 5,
-    'knight': 3,
-    'bishop': 3,
-    'queen': 9,
-    'king': 30
-}
-
 CHESS_PIECE_IMAGES = {
     'pawn_black': 'data/chess_pieces/pawn_black.png',
     'pawn_white': 'data/chess_pieces/pawn_white.png',
@@ -52,5 +51,5 @@ CHESS_PIECE_IMAGES = {
     'king_white': 'data/chess_pieces/king_white.png',
 }
 
-# making king out of screen bounds hence when comparing pieces will always be -ve
-DEFAULT_PIECE: Piece = Piece(Vector2(1000, 1000), 'pawn', 'black')
+# a piece that is not on any square, stands for no piece being selected
+DEFAULT_PIECE: Piece = Piece(EMPTY, piece_index(BLACK, PAWN))
@@ -0,0 +1,17 @@
+# constants of the game itself, kept free of pygame so the rules can run without a display
+
+POSSIBLE_PROMOTIONS = {
+    'pawn',
+    'rook',
+    'knight',
+    'bishop',
+    'queen'
+}
+PIECE_VALUES = {
+    'pawn': 1,
+    'rook': 5,
+    'knight': 3,
+    'bishop': 3,
+    'queen': 9,
+    'king': 30
+}
@@ -1,9 +1,11 @@
+import pygame
 from pygame.image import load
 from pygame.transform import scale
-from PIL import Image
 
+from utils.constants import CHESS_PIECE_IMAGES
 
-def resize_image(image_path, desired_width=55) -> Image:
+
+def resize_image(image_path, desired_width=55) -> pygame.Surface:
     image = load(image_path)
     # Calculate aspect ratio
     aspect_ratio = image.get_height() / image.get_width()
@@ -13,3 +15,33 @@ def resize_image(image_path, desired_width=55) -> Image:
 
     resized_image = scale(image, (desired_width, new_height))
     return resized_image
+
+
+# loads and scales every chess piece image once, instead of reading it from disk on every frame
+class SpriteCache:
+    def __init__(self):
+        self.tile_size: int = 0
+
+        # scaled images indexed by (piece name, tile size), e.g. ('pawn_white', 60)
+        self.sprites: dict[(str, int):pygame.Surface] = dict()
+
+    # returns the image of a piece scaled to fit a tile, rebuilding the cache if the tile size changed
+    def get(self, piece_name: str, tile_size: float) -> pygame.Surface:
+        tile_size = int(tile_size)
+        if tile_size != self.tile_size:
+            self.rebuild(tile_size)
+        return self.sprites[piece_name, tile_size]
+
+    def rebuild(self, tile_size: int):
+        self.sprites.clear()
+        self.tile_size = tile_size
+
+        # leave a small margin so that the piece does not cover the tile borders
+        desired_width = max(tile_size - 5, 1)
+        for piece_name, image_path in CHESS_PIECE_IMAGES.items():
+            image = resize_image(image_path, desired_width)
+
+            # match the display's pixel format so blits don't have to convert on every frame
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha()
+            self.sprites[piece_name, tile_size] = image